@@ -88,6 +88,36 @@ class BaseTagger(object):
         """
         raise NotImplementedError('._tag_annotation() is not implemented.')
     
+    def _retag(self, annotation, tags):
+        """Copy of `annotation` with some of its tracks relabelled
+        
+        Parameters
+        ----------
+        annotation : Annotation
+            Target annotation.
+        tags : dict
+            New labels, indexed by (segment, track) for multi-track 
+            annotation, by segment for single-track annotation.
+        
+        Returns
+        -------
+        tagged : Annotation
+            Built at once (see Annotation.from_records)
+        
+        """
+        
+        if annotation.multitrack:
+            records = ((segment, track, tags.get((segment, track), label)) 
+                       for segment, track, label in annotation.iterlabels())
+        else:
+            records = ((segment, tags.get(segment, label)) 
+                       for segment, label in annotation.iterlabels())
+        
+        return Annotation.from_records(records, 
+                                       multitrack=annotation.multitrack,
+                                       video=annotation.video,
+                                       modality=annotation.modality)
+    
     def _check(self, source, target):
         """Check source and target format.
         
@@ -23,6 +23,7 @@ Module ``pyannote.algorithm.tagging.segment`` provides segment-wise tagging algo
 """
 
 from base import BaseTagger
+from pyannote.base.annotation import Annotation, DEFAULT_TRACK_PREFIX
 
 class ConservativeDirectTagger(BaseTagger):
     """
@@ -54,11 +55,12 @@ class ConservativeDirectTagger(BaseTagger):
         
         """
         
-        # initialize tagged annotation as a copy of target annotation
-        tagged = annotation.copy()
+        # new labels, indexed by (segment, track) -- or segment
+        # tagged annotation is built at once from them (see ._retag())
+        tags = {}
         
         # tag each segment of target annotation, one after the other
-        for segment in tagged:
+        for segment in annotation:
             
             # extract the part of source annotation
             # intersecting current target segment
@@ -72,10 +74,10 @@ class ConservativeDirectTagger(BaseTagger):
             # if tagged annotation is multitrack, only tag segment 
             # when target has exactly one track and source only one
             # co-occurring label
-            if tagged.multitrack:
+            if annotation.multitrack:
                 
                 # don't do anything if target has more than one track
-                tracks = set(tagged[segment, :])
+                tracks = set(annotation[segment, :])
                 if len(tracks) > 1:
                     continue
                 
@@ -84,7 +86,7 @@ class ConservativeDirectTagger(BaseTagger):
                 if len(labels) > 1:
                     continue
                 
-                tagged[segment, tracks.pop()] = labels[0]
+                tags[segment, tracks.pop()] = labels[0]
             
             # if tagged annotation is single-track, only tag segment
             # when source has exactly one co-occurring label
@@ -95,9 +97,9 @@ class ConservativeDirectTagger(BaseTagger):
                 if len(labels) > 1:
                     continue
                 
-                tagged[segment] = labels[0]
+                tags[segment] = labels[0]
         
-        return tagged
+        return self._retag(annotation, tags)
 
 
 class ArgMaxDirectTagger(BaseTagger):
@@ -144,36 +146,40 @@ class ArgMaxDirectTagger(BaseTagger):
         
         """
         
-        # initialize tagged timeline as an empty copy of source
-        T = source.empty()
+        # tagged timeline is built at once from these records
+        records = []
         
         # tag each segment of target timeline, one after the other
         for segment in timeline:
             
-            # extract the part of source annotation
-            # intersecting current target segment
-            t = source(segment, mode='loose')
+            # source segments intersecting current target segment
+            # (no need to extract the sub-annotation: source.argmax()
+            # directly looks for labels intersecting target segment)
+            segments = list(source.timeline.view(segment, mode='loose'))
             
             # if there is no intersecting segment
             # just skip to the next one
-            if not t:
+            if not segments:
                 continue
             
             # if source is multi-track
             # find largest number of co-occurring tracks ==> N
             # find N labels with greatest intersection duration
             # tag N tracks with those N labels
-            if T.multitrack:
+            if source.multitrack:
                 
                 # find largest number of simultaneous tracks (n_tracks)
-                n_tracks = max([len(t[s, :]) for s in t])
+                n_tracks = max([len(source[s, :]) for s in segments])
+                
+                # labels already used for current segment
+                used = set([])
                 
                 # find n_tracks labels with greatest intersection duration
                 # and add them to the segment
                 for i in range(n_tracks):
                     
                     # find current best label
-                    label = t.argmax(segment)
+                    label = source.argmax(segment, exclude=used)
                     
                     # if there is no label in stock
                     # just stop tagging this segment
@@ -181,20 +187,25 @@ class ArgMaxDirectTagger(BaseTagger):
                         break
                     # if current best label exists
                     # create a new track and go for it.
+                    # (same as new_track() since segment has i tracks)
                     else:
-                        T[segment, T.new_track(segment)] = label
-                        t = t(label, invert=True)
+                        track = '%s%d' % (DEFAULT_TRACK_PREFIX, i)
+                        records.append((segment, track, label))
+                        used.add(label)
             
             # if source is single-track,
             # tag current target segment with greatest intersection duration
             else:
                 # find label with greatest intersection
-                label = t.argmax(segment)
+                label = source.argmax(segment)
                 # if it exists, go for it!
                 if label:
-                    T[segment] = label
+                    records.append((segment, label))
         
-        return T
+        return Annotation.from_records(records, 
+                                       multitrack=source.multitrack, 
+                                       video=source.video, 
+                                       modality=source.modality)
     
     def _tag_annotation(self, source, annotation):
         """Annotation tagging
@@ -213,31 +224,33 @@ class ArgMaxDirectTagger(BaseTagger):
         
         """
         
-        # initialize tagged annotation as a copy of target annotation
-        tagged = annotation.copy()
+        # new labels, indexed by (segment, track) -- or segment
+        # tagged annotation is built at once from them (see ._retag())
+        tags = {}
         
         # tag each segment of target annotation, one after the other
-        for segment in tagged:
+        for segment in annotation:
             
-            # extract the part of source annotation
-            # intersecting current target segment
-            t = source(segment, mode='loose')
-            
-            # if there is no intersecting segment
-            # just skip to the next one
-            if not t:
+            # if there is no source segment intersecting current target 
+            # segment, just skip to the next one (no need to extract the 
+            # sub-annotation: source.argmax() directly looks for labels
+            # intersecting target segment)
+            if not source.timeline.view(segment, mode='loose'):
                 continue
             
             # if tagged annotation is multitrack
             # tag each track one after the other using argmax labels
-            if tagged.multitrack:
+            if annotation.multitrack:
+                
+                # labels already used for current segment
+                used = set([])
                 
                 # tag each track one after the other
                 # always choose label with greatest intersection duration
-                for track in tagged[segment, :]:
+                for track in annotation[segment, :]:
                     
                     # find current best label
-                    label = t.argmax(segment)
+                    label = source.argmax(segment, exclude=used)
                     
                     # if there is no label in stock
                     # just stop tagging this segment
@@ -247,20 +260,20 @@ class ArgMaxDirectTagger(BaseTagger):
                     # if current best label exists, 
                     # go for it and tag track
                     else:
-                        tagged[segment, track] = label
-                        t = t(label, invert=True)
+                        tags[segment, track] = label
+                        used.add(label)
             
             # if tagged annotation is single-track
             # do the same (except there is only one track...)
             else:
                 
                 # find label with greatest intersection
-                label = t.argmax(segment)
+                label = source.argmax(segment)
                 # if it exists, go for it!
                 if label:
-                    tagged[segment] = label
+                    tags[segment] = label
         
-        return tagged
+        return self._retag(annotation, tags)
 
 
 if __name__ == "__main__":
@@ -19,7 +19,9 @@
 #     along with PyAnnote.  If not, see <http://www.gnu.org/licenses/>.
 
 from segment import Segment
-from timeline import Timeline
+from timeline import Timeline, _depth
+import npz
+import numpy as np
 from mapping import Mapping, ManyToOneMapping
 from collections import Hashable
 import operator
@@ -60,6 +62,89 @@ class Unknown(object):
         else:
             return False
 
+def _label_func(translation):
+    """Label translation function
+    
+    Parameters
+    ----------
+    translation : dict or Mapping
+    
+    Returns
+    -------
+    label_func : function
+        Translate labels that have an actual translation, 
+        keep the others as they are.
+    
+    """
+    
+    # translation is provided as a {'original' --> 'translated'} dict.
+    if isinstance(translation, dict):
+        
+        # only transform labels that have an actual translation
+        # stored in the provided dictionary, keep the others as they are.
+        return lambda x: translation[x] \
+                         if x in translation and translation[x] \
+                         else x
+    
+    # translation is provided as a ManyToOneMapping
+    try:
+        translation = ManyToOneMapping.fromMapping(translation)
+    except Exception, e:
+        raise ValueError('expected N-to-1 mapping.')
+    
+    # only transform labels that actually have a mapping 
+    # see ManyToOneMapping.__call__() API
+    return lambda x: translation(x) if translation(x) else x
+
+def _regions(annotations):
+    """Label regions of several annotations, with one sweep
+    
+    Start and end times of all labelled tracks are sorted once -- 
+    O(n log n) where n is the total number of tracks. They are then swept 
+    while maintaining the number of active tracks of each label.
+    
+    Parameters
+    ----------
+    annotations : list of Annotation
+    
+    Returns
+    -------
+    regions : generator
+        (segment, labels) tuples, sorted by segment, where labels[k] is the 
+        set of labels of annotations[k] active during the whole segment.
+        Segments delimited by two consecutive boundaries are only yielded
+        if at least one label is active.
+    
+    """
+    
+    # +1 when a track starts, -1 when it ends
+    events = []
+    for k, annotation in enumerate(annotations):
+        for row in annotation.iterlabels():
+            segment, label = row[0], row[-1]
+            events.append((segment.start, k, label, 1))
+            events.append((segment.end, k, label, -1))
+    events.sort(key=operator.itemgetter(0))
+    
+    # active[k][label] is the number of active tracks labelled by label
+    # in annotations[k] (labels with no active track are removed)
+    active = [{} for annotation in annotations]
+    
+    previous = None
+    for time, k, label, delta in events:
+        
+        # all events at time previous have been processed:
+        # labels are active until time
+        if previous is not None and time > previous and any(active):
+            yield Segment(previous, time), [set(a) for a in active]
+        previous = time
+        
+        count = active[k].get(label, 0) + delta
+        if count:
+            active[k][label] = count
+        else:
+            del active[k][label]
+
 class Annotation(object):
     """
     Annotated timeline.
@@ -115,15 +200,333 @@ class Annotation(object):
         # this is a dictionary indexed by labels.
         # .__label_timeline[label] is a timeline made of segments for which
         # there exists at least one track labelled by label.
-        # when a label no longer exists, its entry must be removed.
+        # it is only a cache (see .__get_label_timeline()): the entry of a 
+        # label must be removed every time this label is added or removed.
         self.__label_timeline = {}
         
+        # this is a dictionary indexed by labels.
+        # .__label_coverage[label] is a (starts, ends, cumulative) tuple of 
+        # arrays describing the coverage of label timeline (see 
+        # .__get_label_coverage()). same as .__label_timeline, it is only a 
+        # cache which must be emptied whenever label timeline changes.
+        self.__label_coverage = {}
+        
         # this is a dictionary indexed by labels
         # .__label_count[label] is a dictionary indexed by segments containing
         # at least one track labelled by label.
         # .__label_count[label][segment] contains the number of tracks labelled
         # as label in this segment. when zero, segment entry must be removed.
         self.__label_count = {}
+        
+        # this is a dictionary indexed by labels
+        # .__label_index[label] is the set of (segment, track) tuples 
+        # labelled as label. when empty, label entry must be removed.
+        self.__label_index = {}
+        
+        # this is a dictionary indexed by labels.
+        # .__label_stats[label] caches statistics about label (see 
+        # .label_stats()). the entry of a label must be removed every time 
+        # this label is added or removed.
+        self.__label_stats = {}
+        
+        # sorted list of labels (see .labels()), or None when it must be 
+        # recomputed -- every time a label appears or disappears.
+        self.__sorted_labels = None
+    
+    @classmethod
+    def from_records(cls, records, multitrack=True, video=None, 
+                     modality=None, validate=False):
+        """Bulk annotation construction
+        
+        Segments are sorted once and every internal index is built in one
+        pass -- instead of adding records one after the other with 
+        `annotation[segment, track] = label`.
+        
+        Parameters
+        ----------
+        records : iterator
+            (segment, track, label) tuples for multi-track annotation,
+            (segment, label) tuples for single-track annotation -- as
+            yielded by .iterlabels(). When several records share the same
+            segment (and track), the last one wins.
+        multitrack, video, modality : 
+            See Annotation.
+        validate : bool, optional
+            Set to True to check segments, tracks and labels the same way 
+            `annotation[segment, track] = label` does. When False (default),
+            records are trusted and only empty segments are skipped.
+        
+        Returns
+        -------
+        annotation : Annotation
+        
+        Raises
+        ------
+        KeyError, ValueError if `validate` is True and one record is invalid
+        
+        Examples
+        --------
+            
+            >>> records = [(Segment(3, 4), 'speaker1', 'Albert'), 
+            ...            (Segment(0, 2), 'speaker2', 'John'),
+            ...            (Segment(0, 2), 'speaker1', 'Bernard')]
+            >>> print Annotation.from_records(records)
+            [
+               [0 --> 2] speaker1 : Bernard
+                         speaker2 : John
+               [3 --> 4] speaker1 : Albert
+            ]
+        
+        """
+        
+        annotation = cls(multitrack=multitrack, video=video, 
+                         modality=modality)
+        
+        if not multitrack:
+            records = ((segment, UNIQUE_TRACK, label) 
+                       for segment, label in records)
+        
+        if validate:
+            records = annotation.__validated(records)
+        else:
+            records = ((segment, track, label) 
+                       for segment, track, label in records if segment)
+        
+        annotation.__build(records)
+        return annotation
+    
+    def __validated(self, records):
+        """Check (segment, track, label) records lazily"""
+        for segment, track, label in records:
+            if not self.__valid_segment(segment):
+                raise KeyError("invalid segment.")
+            if not self.__valid_track(track):
+                raise KeyError('invalid track name.')
+            if not self.__valid_label(label):
+                raise ValueError('invalid label.')
+            yield segment, track, label
+    
+    def __getstate__(self):
+        """Compact state: one row per (segment, track) in a few arrays
+        
+        Segments are stored as arrays of start and end times, tracks and 
+        labels as arrays of indices in vocabulary tables (track_names and
+        label_names). Label timelines and counts are rebuilt from them.
+        
+        """
+        
+        starts = []
+        ends = []
+        tracks = []
+        labels = []
+        track_index = {}
+        label_index = {}
+        
+        for segment in self.__timeline:
+            for track, label in self.__data[segment].iteritems():
+                starts.append(segment.start)
+                ends.append(segment.end)
+                tracks.append(track_index.setdefault(track, len(track_index)))
+                labels.append(label_index.setdefault(label, len(label_index)))
+        
+        track_names = sorted(track_index, key=track_index.get)
+        label_names = sorted(label_index, key=label_index.get)
+        
+        return {'multitrack': self.multitrack, 
+                'video': self.video, 
+                'modality': self.modality,
+                'starts': np.array(starts, dtype=np.float64),
+                'ends': np.array(ends, dtype=np.float64),
+                'tracks': np.array(tracks, dtype=np.int64),
+                'labels': np.array(labels, dtype=np.int64),
+                'track_names': npz.vocabulary(track_names),
+                'label_names': npz.vocabulary(label_names)}
+    
+    def __setstate__(self, state):
+        
+        Annotation.__init__(self, multitrack=state['multitrack'], 
+                            video=state['video'], modality=state['modality'])
+        
+        track_names = state['track_names'].tolist()
+        label_names = state['label_names'].tolist()
+        
+        def rows():
+            segment = None
+            for start, end, t, l in zip(state['starts'].tolist(), 
+                                        state['ends'].tolist(),
+                                        state['tracks'].tolist(), 
+                                        state['labels'].tolist()):
+                # tracks of a segment are stored next to each other
+                if segment is None or \
+                   segment.start != start or segment.end != end:
+                    segment = Segment(start=start, end=end)
+                yield segment, track_names[t], label_names[l]
+        
+        # rows were saved sorted by segment
+        self.__build(rows(), assume_sorted=True)
+    
+    def __build(self, rows, assume_sorted=False):
+        """Fill (empty) annotation with a bunch of labelled tracks at once
+        
+        Parameters
+        ----------
+        rows : iterator
+            (segment, track, label) tuples, with non-empty segments. 
+            When several rows share the same segment and track, 
+            the last one wins.
+        assume_sorted : bool, optional
+            Set to True when rows are sorted by segment. Defaults to False.
+        
+        """
+        
+        segments = []
+        
+        # first pass: internal data
+        for segment, track, label in rows:
+            if segment not in self.__data:
+                self.__data[segment] = {}
+                segments.append(segment)
+            self.__data[segment][track] = label
+        
+        # second pass: label index and counts
+        for segment in segments:
+            for track, label in self.__data[segment].iteritems():
+                
+                index = self.__label_index.setdefault(label, set())
+                index.add((segment, track))
+                
+                count = self.__label_count.setdefault(label, {})
+                count[segment] = count.get(segment, 0) + 1
+        
+        # label timelines will be built on demand
+        self.__timeline = Timeline.from_segments(segments, video=self.video, 
+                                                 assume_sorted=assume_sorted)
+    
+    def __get_label_timeline(self, label):
+        """Timeline of `label` (must not be modified!)
+        
+        It is built from label counts on first access, and cached until 
+        `label` is added or removed.
+        
+        """
+        if label not in self.__label_timeline:
+            self.__label_timeline[label] = Timeline.from_segments(
+                                                self.__label_count[label], 
+                                                video=self.video)
+        return self.__label_timeline[label]
+    
+    def __get_label_coverage(self, label):
+        """Coverage of `label` as sorted arrays (must not be modified!)
+        
+        Returns
+        -------
+        starts, ends : numpy arrays
+            Start and end times of (sorted, non-overlapping) segments of 
+            label timeline coverage.
+        cumulative : numpy array
+            cumulative[i] is the total duration of the first i segments.
+        
+        """
+        if label not in self.__label_coverage:
+            coverage = self.__get_label_timeline(label).coverage()
+            starts = np.array([s.start for s in coverage], dtype=float)
+            ends = np.array([s.end for s in coverage], dtype=float)
+            cumulative = np.zeros((len(starts)+1,), dtype=float)
+            np.cumsum(ends - starts, out=cumulative[1:])
+            self.__label_coverage[label] = (starts, ends, cumulative)
+        return self.__label_coverage[label]
+    
+    def __label_duration(self, label, segment):
+        """Duration of `label` within `segment`, in O(log n)"""
+        
+        starts, ends, cumulative = self.__get_label_coverage(label)
+        
+        # coverage segments [i, j[ are those intersecting segment
+        # (ie. ending after its start and starting before its end)
+        i = np.searchsorted(ends, segment.start, side='right')
+        j = np.searchsorted(starts, segment.end, side='left')
+        if j <= i:
+            return 0.
+        
+        # trimmed first and last segments...
+        start = max(starts[i], segment.start)
+        end = min(ends[j-1], segment.end)
+        if j == i + 1:
+            return float(end - start)
+        
+        # ... plus total duration of segments in between
+        duration = (ends[i] - start) + (end - starts[j-1])
+        return float(duration + cumulative[j-1] - cumulative[i+1])
+    
+    def save(self, path):
+        """Save annotation to disk, in compact .npz format
+        
+        Tracks and labels that cannot be stored as plain string or numeric
+        arrays (eg. Unknown labels) are pickled: loading them back requires
+        `allow_pickle` (see Annotation.load).
+        
+        Parameters
+        ----------
+        path : str
+            Path to .npz file ('.npz' extension is appended if missing).
+        
+        See Also
+        --------
+        Annotation.load
+        
+        """
+        state = self.__getstate__()
+        for key in ['multitrack', 'video', 'modality']:
+            value = state.pop(key)
+            if value is not None:
+                state[key] = np.array(value)
+        npz.save(path, **state)
+    
+    @classmethod
+    def load(cls, path, allow_pickle=False):
+        """Load annotation saved with .save()
+        
+        Annotation is rebuilt from arrays at once: use 
+        ColumnarAnnotation.load() to memory-map them instead.
+        
+        Parameters
+        ----------
+        path : str
+            Path to .npz file ('.npz' extension is appended if missing).
+        allow_pickle : bool, optional
+            Allow loading tracks and labels that were pickled (eg. Unknown
+            labels). Only set it to True for trusted files. 
+            Defaults to False.
+        
+        Returns
+        -------
+        annotation : Annotation
+        
+        Examples
+        --------
+        
+            >>> import tempfile, os
+            >>> path = os.path.join(tempfile.mkdtemp(), 'annotation.npz')
+            >>> annotation = Annotation(multitrack=True, video="MyVideo.avi")
+            >>> annotation[Segment(0, 2), 'speaker1'] = 'Bernard'
+            >>> annotation[Segment(0, 2), 'speaker2'] = 'John'  
+            >>> annotation[Segment(3, 4), 'speaker1'] = 'Albert'
+            >>> annotation.save(path)
+            >>> print Annotation.load(path)
+            [
+               [0 --> 2] speaker1 : Bernard
+                         speaker2 : John
+               [3 --> 4] speaker1 : Albert
+            ]
+        
+        """
+        state = npz.load(path, mmap=False, allow_pickle=allow_pickle)
+        for key in ['multitrack', 'video', 'modality']:
+            value = state.pop(key, None)
+            state[key] = None if value is None else value.item()
+        annotation = cls.__new__(cls)
+        annotation.__setstate__(state)
+        return annotation
     
     def __get_multitrack(self):
         return self.__multitrack
@@ -196,7 +599,80 @@ class Annotation(object):
             Sorted list of existing labels (based on their string version)
         
         """
-        return sorted(self.__label_count.keys(), key=str)
+        # sort only once, until a label appears or disappears
+        if self.__sorted_labels is None:
+            self.__sorted_labels = sorted(self.__label_count.keys(), key=str)
+        return list(self.__sorted_labels)
+    
+    def __get_label_stats(self, label):
+        """Statistics about `label` (must not be modified!)"""
+        if label not in self.__label_stats:
+            timeline = self.__get_label_timeline(label)
+            extent = timeline.extent()
+            self.__label_stats[label] = {
+                'duration': timeline.duration(),
+                'n_segments': len(self.__label_count[label]),
+                'n_tracks': len(self.__label_index[label]),
+                'first': extent.start,
+                'last': extent.end,
+            }
+        return self.__label_stats[label]
+    
+    def label_stats(self):
+        """Per-label statistics
+        
+        Statistics are cached: they are only computed again for labels that
+        were added or removed since last call.
+        
+        Returns
+        -------
+        stats : dict
+            Statistics indexed by label. Statistics about one label are a
+            dictionary with the following keys:
+            - 'duration': duration of label timeline coverage, in seconds
+            - 'n_segments': number of segments with this label
+            - 'n_tracks': number of tracks with this label
+            - 'first': start time of first segment with this label
+            - 'last': end time of last segment with this label
+        
+        Examples
+        --------
+            
+            >>> annotation = Annotation(multitrack=True)
+            >>> annotation[Segment(0, 2), 'speaker1'] = 'Bernard'
+            >>> annotation[Segment(0, 2), 'speaker2'] = 'Bernard'
+            >>> annotation[Segment(1, 4), 'speaker3'] = 'Bernard'
+            >>> annotation[Segment(5, 6), 'speaker1'] = 'John'
+            >>> stats = annotation.label_stats()
+            >>> print sorted(stats['Bernard'].items())
+            [('duration', 4.0), ('first', 0.0), ('last', 4.0), ('n_segments', 2), ('n_tracks', 3)]
+        
+        """
+        return {label: dict(self.__get_label_stats(label)) 
+                for label in self.__label_count}
+    
+    def chart(self):
+        """Labels sorted by decreasing duration
+        
+        Returns
+        -------
+        chart : list
+            (label, duration) tuples, sorted by decreasing duration.
+        
+        Examples
+        --------
+            
+            >>> annotation = Annotation(multitrack=False)
+            >>> annotation[Segment(0, 10)] = 'Alice'
+            >>> annotation[Segment(8, 20)] = 'Bob'
+            >>> annotation[Segment(22, 25)] = 'Alice'
+            >>> print annotation.chart()
+            [('Alice', 13.0), ('Bob', 12.0)]
+        
+        """
+        chart = [(label, self.__get_label_stats(label)['duration']) 
+                 for label in self.labels()]
+        return sorted(chart, key=operator.itemgetter(1), reverse=True)
     
     def get_labels(self, segment):
         """Local set of labels
@@ -231,7 +707,50 @@ class Annotation(object):
             return set([self.__data[segment][track] \
                         for track in self.__data[segment]])
     
-    def argmax(self, segment=None):
+    def labels_at(self, times):
+        """Local sets of labels at each timestamp
+        
+        Parameters
+        ----------
+        times : float or array-like
+            Timestamps, in seconds (flattened if multi-dimensional).
+        
+        Returns
+        -------
+        labels : list
+            labels[i] is the set of labels of tracks whose segment contains
+            i.th (flattened) timestamp (empty set if there is none).
+        
+        See Also
+        --------
+        Timeline.at
+        
+        Examples
+        --------
+        
+            >>> annotation = Annotation(multitrack=True)
+            >>> annotation[Segment(0, 4), 'speaker1'] = 'Alice'
+            >>> annotation[Segment(2, 6), 'speaker2'] = 'Bob'
+            >>> for labels in annotation.labels_at([1, 3, 7]):
+            ...     print sorted(labels)
+            ['Alice']
+            ['Alice', 'Bob']
+            []
+            >>> print annotation.labels_at(0.5)
+            [set(['Alice'])]
+        
+        """
+        
+        times = np.asarray(times, dtype=np.float64).ravel()
+        t_indices, s_indices = self.__timeline.at(times)
+        
+        labels = [set([]) for t in range(len(times))]
+        for t, s in zip(t_indices, s_indices):
+            labels[t].update(self.__data[self.__timeline[s]].itervalues())
+        
+        return labels
+    
+    def argmax(self, segment=None, exclude=None):
         """Most frequent label
         
         If `segment` is provided, argmax will return the label with longest
@@ -241,11 +760,19 @@ class Annotation(object):
         
         If no label intersects segment, returns None
         
+        Per-label coverage is cached as sorted arrays with cumulative 
+        durations, so that the intersection duration of each label is 
+        obtained with two binary searches.
+        
         Parameters
         ----------
         segment : Segment, optional
             Section of annotation where to look for the most frequent label.
             Defaults to annotation timeline extent.
+        exclude : iterable, optional
+            Labels that must not be returned. 
+            Same as (but much faster than) `annotation(exclude, invert=True)
+            .argmax(segment)`.
         
         Returns
         -------
@@ -262,22 +789,31 @@ class Annotation(object):
             >>> segment = Segment(22, 23)
             >>> if not annotation.argmax(segment):
             ...    print "No label intersecting %s" % segment
-            No label intersection [22 --> 23]
+            No label intersecting [22 --> 23]
+            >>> print annotation.argmax(Segment(5, 15), exclude=['Bob'])
+            Alice
         
         """
         
-        # if annotation is empty, obviously there is no most frequent label
-        if not self:
+        labels = self.labels()
+        if exclude is not None:
+            exclude = set(exclude)
+            labels = [lbl for lbl in labels if lbl not in exclude]
+        
+        # if there is no label left, obviously there is no most frequent one
+        if not labels:
             return None
         
         # if segment is not provided, just look for the overall most frequent
-        # label (ie. set segment to the extent of the annotation)
+        # label (ie. the one with the longest cached duration)
         if segment is None:
-            segment = self.timeline.extent()
+            durations = {lbl: self.__get_label_stats(lbl)['duration'] 
+                         for lbl in labels}
         
         # compute intersection duration for each label
-        durations = {lbl: (self.__label_timeline[lbl] & segment).duration()\
-                     for lbl in self.labels()}
+        else:
+            durations = {lbl: self.__label_duration(lbl, segment) 
+                         for lbl in labels}
         
         # find the most frequent label
         label = max(durations.iteritems(), key=operator.itemgetter(1))[0]
@@ -286,6 +822,98 @@ class Annotation(object):
         return label if durations[label] > 0 else None
     
     
+    def depth(self, labels=False):
+        """Overlap depth profile
+        
+        Number of simultaneously active tracks (or labels), computed with one
+        sweep over sorted boundaries -- O(n log n).
+        
+        Parameters
+        ----------
+        labels : bool, optional
+            When True, count distinct active labels instead of active tracks.
+            Defaults to False.
+        
+        Returns
+        -------
+        boundaries : numpy array
+            Sorted unique boundaries.
+        counts : numpy array
+            counts[i] is the number of tracks (or labels) active between 
+            boundaries[i] and boundaries[i+1] (possibly zero, in gaps).
+        
+        See Also
+        --------
+        Timeline.depth
+        
+        Examples
+        --------
+        
+            >>> annotation = Annotation(multitrack=True)
+            >>> annotation[Segment(0, 4), 'speaker1'] = 'Alice'
+            >>> annotation[Segment(0, 4), 'speaker2'] = 'Bob'
+            >>> annotation[Segment(2, 6), 'speaker3'] = 'Alice'
+            >>> boundaries, counts = annotation.depth()
+            >>> print boundaries
+            [0. 2. 4. 6.]
+            >>> print counts
+            [2 3 1]
+            >>> boundaries, counts = annotation.depth(labels=True)
+            >>> print boundaries
+            [0. 4. 6.]
+            >>> print counts
+            [2 1]
+        
+        """
+        
+        if labels:
+            # each label contributes once wherever its timeline is active
+            segments = [segment for label in self.__label_count \
+                                for segment in \
+                                self.__get_label_timeline(label).coverage()]
+            weights = None
+        else:
+            # each segment contributes as many times as it has tracks
+            segments = list(self.__timeline)
+            weights = [len(self.__data[segment]) for segment in segments]
+        
+        return _depth([segment.start for segment in segments],
+                      [segment.end for segment in segments],
+                      weights=weights)
+    
+    def label_regions(self):
+        """Elementary regions with their set of active labels
+        
+        Computed with one sweep over sorted boundaries -- O(n log n).
+        
+        Returns
+        -------
+        regions : generator
+            (segment, labels) tuples, sorted by segment, where labels is the
+            set of labels active during the whole segment. Gaps are skipped.
+        
+        See Also
+        --------
+        co_iterate
+        
+        Examples
+        --------
+        
+            >>> annotation = Annotation(multitrack=True)
+            >>> annotation[Segment(0, 4), 'speaker1'] = 'Alice'
+            >>> annotation[Segment(2, 6), 'speaker2'] = 'Bob'
+            >>> annotation[Segment(8, 9), 'speaker1'] = 'Alice'
+            >>> for segment, labels in annotation.label_regions():
+            ...     print segment, sorted(labels)
+            [0 --> 2] ['Alice']
+            [2 --> 4] ['Alice', 'Bob']
+            [4 --> 6] ['Bob']
+            [8 --> 9] ['Alice']
+        
+        """
+        for segment, (labels, ) in _regions([self]):
+            yield segment, labels
+    
     # Function used to parse key used to access annotation elements
     # eg. annotation[segment] or annotation[segment, track]
     def __parse_key(self, key):
@@ -418,24 +1046,27 @@ class Annotation(object):
         # Store label for segment/track
         self.__data[segment][track] = label
         
-        # Create label timeline if necessary
-        if label not in self.__label_timeline:
-            self.__label_timeline[label] = Timeline(video=self.video)
-        
-        # Add segment to label timeline
-        # Note: it won't be added twice if it already exists (see timeline API)
-        self.__label_timeline[label] += segment
-        
         # Create label count dictionary if necessary
+        # (sorted list of labels is then no longer up to date)
         if label not in self.__label_count:
             self.__label_count[label] = {}
+            self.__sorted_labels = None
+        
+        # Label statistics are no longer up to date
+        self.__label_stats.pop(label, None)
         
         # Initialize label count for provided segment if necessar
+        # (label timeline is then no longer up to date)
         if segment not in self.__label_count[label]:
             self.__label_count[label][segment] = 0
+            self.__label_timeline.pop(label, None)
+            self.__label_coverage.pop(label, None)
             
         # Increment label count for provided segment
         self.__label_count[label][segment] += 1
+        
+        # Add segment/track to label index
+        self.__label_index.setdefault(label, set()).add((segment, track))
     
     def __delitem__(self, key):
         """Remove label
@@ -463,6 +1094,14 @@ class Annotation(object):
         # Remove track from internal data for provided segment
         del self.__data[segment][track]
         
+        # Remove segment/track from label index
+        self.__label_index[label].discard((segment, track))
+        if not self.__label_index[label]:
+            del self.__label_index[label]
+        
+        # Label statistics are no longer up to date
+        self.__label_stats.pop(label, None)
+        
         # If segment no longer has any track
         # Remove segment as well
         if not self.__data[segment]:
@@ -484,14 +1123,11 @@ class Annotation(object):
             # remove label from dictionary
             if not self.__label_count[label]:
                 del self.__label_count[label]
+                self.__sorted_labels = None
                 
-            # remove segment from label timeline
-            del self.__label_timeline[label][segment]
-            
-            # if timeline is empty
-            # remove label timeline as well
-            if not self.__label_timeline[label]:
-                del self.__label_timeline[label]
+            # label timeline is no longer up to date
+            self.__label_timeline.pop(label, None)
+            self.__label_coverage.pop(label, None)
     
     def __len__(self):
         """Use expression 'len(annotation)'
@@ -698,8 +1334,15 @@ class Annotation(object):
         
         """
         
-        # starts with an empty copy.
-        T = self.empty()
+        # plain copy: records are already valid and sorted
+        if segment_func is None and track_func is None and label_func is None:
+            T = self.empty()
+            T.__build(((segment, track, label) 
+                       for segment in self.__timeline 
+                       for track, label 
+                       in sorted(self.__data[segment].iteritems())), 
+                      assume_sorted=True)
+            return T
         
         # If functions are not provided
         # make them pass-trough functions
@@ -710,23 +1353,17 @@ class Annotation(object):
         if label_func is None:
             label_func = lambda l: l
         
-        if self.multitrack:
-            for segment, track, label in self.iterlabels():
-                new_segment = segment_func(segment)
-                
-                # Copy annotation only if transformed segment is valid
-                # (make sure track and label are transformed as well)
-                if new_segment:
-                    T[new_segment, track_func(track)] = label_func(label)
-        else:
-            for segment, label in self.iterlabels():
-                new_segment = segment_func(segment)
-                
-                # Copy annotation only if transformed segment is valid
-                # (make sure label is transformed as well)
-                if new_segment:
-                    T[new_segment] = label_func(label)
+        # Copy annotation only if transformed segment is valid
+        # (make sure track and label are transformed as well)
+        records = ((segment_func(segment), track, label) 
+                   for segment in self.__timeline 
+                   for track, label in sorted(self.__data[segment].iteritems()))
+        records = ((new_segment, track_func(track), label_func(label)) 
+                   for new_segment, track, label in records if new_segment)
         
+        # transformed tracks and labels must be checked
+        T = self.empty()
+        T.__build(T.__validated(records))
         return T
                 
     def __mod__(self, translation):
@@ -763,29 +1400,8 @@ class Annotation(object):
             raise TypeError("unsupported operand types(s) for '\%': "
                             "Annotation and %s" % type(translation).__name__)
         
-        # translation is provided as a {'original' --> 'translated'} dict.
-        if isinstance(translation, dict):
-            
-            # only transform labels that have an actual translation
-            # stored in the provided dictionary, keep the others as they are.
-            label_func = lambda x: translation[x] \
-                                   if x in translation and translation[x] \
-                                   else x
-        
-        # translation is provided as a ManyToOneMapping
-        elif isinstance(translation, Mapping):
-            
-            try:
-                translation = ManyToOneMapping.fromMapping(translation)
-            except Exception, e:
-                raise ValueError('expected N-to-1 mapping.')
-            
-            # only transform labels that actually have a mapping 
-            # see ManyToOneMapping.__call__() API
-            label_func = lambda x: translation(x) if translation(x) else x
-        
         # perform the actual translation
-        return self.copy(label_func=label_func)
+        return self.copy(label_func=_label_func(translation))
     
     def anonymize(self):
         """Anonmyize labels
@@ -799,23 +1415,6 @@ class Annotation(object):
         translation = {label: Unknown() for label in self.labels()} 
         return self % translation
     
-    def __get_label(self, label):
-        
-        T = self.empty()
-        
-        if self.multitrack:
-            for segment in self.__label_timeline[label]:
-                for track in self.__data[segment]:
-                    if self.__data[segment][track] == label:
-                        T[segment, track] = label
-        else:
-            for segment in self.__label_timeline[label]:
-                for track in self.__data[segment]:
-                    if self.__data[segment][track] == label:
-                        T[segment] = label
-        
-        return T
-            
     def __call__(self, subset, mode='strict', invert=False):
         """Sub-annotation extraction.
         
@@ -912,11 +1511,17 @@ class Annotation(object):
         # --------------
         elif isinstance(subset, Segment):
             segment = subset
-            
-            # --- Recursive call as a Timeline subset.            
-            timeline = Timeline(video=self.video)
-            timeline += segment
-            return self.__call__(timeline, mode=mode, invert=invert)            
+
+            if mode not in ('strict', 'loose'):
+                raise ValueError('unsupported mode.')
+
+            # only visit segments that may intersect subset
+            T = self.empty()
+            T.__build(((s, track, label) 
+                       for s in self.__timeline.view(segment, mode=mode)
+                       for track, label in self.__data[s].iteritems()), 
+                      assume_sorted=True)
+            return T
         
         # get set of labels
         elif isinstance(subset, (tuple, list, set)):
@@ -924,21 +1529,15 @@ class Annotation(object):
             # if invert, get the complementary set of labels
             # otherwise, make sure it is a set (not list or tuple)
             if invert:
-                labels = set(self.labels()) - set(subset)
+                labels = set(self.__label_index) - set(subset)
             else:
-                labels = set(subset) & set(self.labels())
+                labels = set(subset) & set(self.__label_index)
             
+            # only visit labelled tracks thanks to label index
             T = self.empty()
-
-            for label in labels:
-                t = self.__get_label(label)
-                if self.multitrack:
-                    for segment, track, label in t.iterlabels():
-                        T[segment, track] = label
-                else:
-                    for segment, label in t.iterlabels():
-                        T[segment] = label
-            
+            T.__build((segment, track, label) 
+                      for label in labels 
+                      for segment, track in self.__label_index[label])
             return T
         
         # get one single label
@@ -1027,6 +1626,44 @@ class Annotation(object):
             new_track = '%s%d' % (prefix, count)
         return new_track
 
+def co_iterate(reference, hypothesis):
+    """Elementary regions of two annotations with their active labels
+    
+    Computed with one sweep over sorted boundaries of both annotations -- 
+    O((n+m) log(n+m)). This is the core loop of most evaluation metrics.
+    
+    Parameters
+    ----------
+    reference, hypothesis : Annotation
+    
+    Returns
+    -------
+    regions : generator
+        (segment, ref_labels, hyp_labels) tuples, sorted by segment, 
+        where ref_labels (resp. hyp_labels) is the set of reference (resp. 
+        hypothesis) labels active during the whole segment. Segments where 
+        neither annotation has any active label are skipped.
+    
+    Examples
+    --------
+    
+        >>> reference = Annotation(multitrack=False)
+        >>> reference[Segment(0, 4)] = 'Alice'
+        >>> reference[Segment(4, 6)] = 'Bob'
+        >>> hypothesis = Annotation(multitrack=False)
+        >>> hypothesis[Segment(1, 5)] = 'A'
+        >>> for segment, r, h in co_iterate(reference, hypothesis):
+        ...     print segment, sorted(r), sorted(h)
+        [0 --> 1] ['Alice'] []
+        [1 --> 4] ['Alice'] ['A']
+        [4 --> 5] ['Bob'] ['A']
+        [5 --> 6] ['Bob'] []
+    
+    """
+    for segment, (ref_labels, hyp_labels) in _regions([reference, 
+                                                       hypothesis]):
+        yield segment, ref_labels, hyp_labels
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
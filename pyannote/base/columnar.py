@@ -0,0 +1,1436 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright 2012 Herve BREDIN (bredin@limsi.fr)
+
+# This file is part of PyAnnote.
+#
+#     PyAnnote is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     PyAnnote is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with PyAnnote.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+The ``pyannote.base.columnar`` module provides array-backed alternatives to
+``pyannote.base`` objects, meant for very large annotation files.
+
+"""
+
+from itertools import izip
+from collections import Hashable
+import numpy as np
+from segment import Segment, SEGMENT_PRECISION
+from timeline import Timeline, _EndIndex
+from annotation import Annotation, Unknown, UNIQUE_TRACK, _label_func
+from mapping import Mapping
+import npz
+
+class ColumnarTimeline(object):
+    """
+    Ordered set of segments, stored as contiguous arrays.
+
+    Same as Timeline, except segments are not stored as Segment objects but
+    as two float64 arrays of start and end times (sorted the same way as
+    Timeline segments). Segment objects are only created on demand (eg. 
+    when iterating).
+
+    No array of positions sorted by end time is kept: crops rely instead on
+    an index (sorted end times and a max-tree over end times) that is only
+    built on first crop and dropped whenever segments are added or removed.
+
+    Parameters
+    ----------
+    segments : Segment iterator, optional
+        initial set of segments
+    video : string, optional
+        name of (audio or video) segmented document
+
+    Returns
+    -------
+    timeline : ColumnarTimeline
+        New timeline
+
+    Examples
+    --------
+
+        >>> timeline = ColumnarTimeline([Segment(6, 8), Segment(0, 1),
+        ...                              Segment(0.5, 3)], video="MyVideo.avi")
+        >>> for segment in timeline:
+        ...    print segment
+        [0 --> 1]
+        [0.5 --> 3]
+        [6 --> 8]
+        >>> print timeline.extent()
+        [0 --> 8]
+        >>> print timeline.coverage()
+        [
+           [0 --> 3]
+           [6 --> 8]
+        ]
+        >>> print timeline.duration()
+        5.0
+        >>> print timeline.gaps(Segment(0, 10))
+        [
+           [3 --> 6]
+           [8 --> 10]
+        ]
+        >>> print timeline(Segment(2, 7), mode='intersection')
+        [
+           [2 --> 3]
+           [6 --> 7]
+        ]
+
+    """
+
+    def __init__(self, segments=None, video=None):
+
+        super(ColumnarTimeline, self).__init__()
+
+        # path to (or any identifier of) segmented video
+        self.__video = video
+
+        if segments is None:
+            segments = []
+
+        try:
+            starts = [segment.start for segment in segments]
+            ends = [segment.end for segment in segments]
+        except Exception, e:
+            raise ValueError('ColumnarTimeline must be initialized using a'
+                             'Segment iterator.')
+
+        self.__build(starts, ends)
+
+    @classmethod
+    def from_arrays(cls, starts, ends, video=None, assume_sorted=False):
+        """Create timeline from arrays of start and end times
+
+        Parameters
+        ----------
+        starts, ends : array-like
+            Segments start and end times, in seconds.
+        video : string, optional
+            name of (audio or video) segmented document
+        assume_sorted : bool, optional
+            Set to True when segments are known to be sorted, non-empty and
+            unique to skip sorting and deduplication. Arrays are then used 
+            as they are (not copied). Defaults to False.
+
+        Returns
+        -------
+        timeline : ColumnarTimeline
+
+        """
+        timeline = cls(video=video)
+        timeline.__build(starts, ends, assume_sorted=assume_sorted)
+        return timeline
+
+    @classmethod
+    def from_timeline(cls, timeline):
+        """Convert Timeline to ColumnarTimeline
+
+        Examples
+        --------
+
+            >>> timeline = Timeline([Segment(0, 1), Segment(2, 3)])
+            >>> print ColumnarTimeline.from_timeline(timeline)
+            [
+               [0 --> 1]
+               [2 --> 3]
+            ]
+
+        """
+        starts = [segment.start for segment in timeline]
+        ends = [segment.end for segment in timeline]
+        return cls.from_arrays(starts, ends, video=timeline.video,
+                               assume_sorted=True)
+
+    def to_timeline(self):
+        """Convert to Timeline"""
+        return Timeline.from_segments(self, video=self.video,
+                                      assume_sorted=True)
+
+    def save(self, path):
+        """Save timeline to disk, in compact .npz format
+
+        Same format as Timeline.save().
+
+        Parameters
+        ----------
+        path : str
+            Path to .npz file ('.npz' extension is appended if missing).
+
+        """
+        arrays = {'starts': self.__starts, 'ends': self.__ends}
+        if self.video is not None:
+            arrays['video'] = np.array(self.video)
+        npz.save(path, **arrays)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load timeline saved with .save() (or Timeline.save())
+
+        Parameters
+        ----------
+        path : str
+            Path to .npz file ('.npz' extension is appended if missing).
+        mmap : bool, optional
+            Memory-map start and end times (read-only) instead of reading
+            them into memory. Defaults to True.
+
+        Returns
+        -------
+        timeline : ColumnarTimeline
+
+        Examples
+        --------
+
+            >>> import tempfile, os
+            >>> path = os.path.join(tempfile.mkdtemp(), 'timeline')
+            >>> timeline = ColumnarTimeline([Segment(0, 1), Segment(6, 8)],
+            ...                             video="MyVideo.avi")
+            >>> timeline.save(path)
+            >>> loaded = ColumnarTimeline.load(path)
+            >>> print loaded.video, loaded == timeline
+            MyVideo.avi True
+
+        """
+        arrays = npz.load(path, mmap=mmap)
+        video = arrays.get('video', None)
+        # segments were saved sorted, non-empty and unique
+        return cls.from_arrays(arrays['starts'], arrays['ends'],
+                               video=None if video is None else video.item(),
+                               assume_sorted=True)
+
+    def __build(self, starts, ends, assume_sorted=False):
+
+        # no copy (eg. of memory-mapped arrays) unless needed
+        starts = np.asarray(starts, dtype=np.float64).ravel()
+        ends = np.asarray(ends, dtype=np.float64).ravel()
+
+        if len(starts) != len(ends):
+            raise ValueError('start and end times must have the same length.')
+
+        if not assume_sorted and len(starts) > 0:
+            # sort by start time first, then by end time
+            order = np.lexsort((ends, starts))
+            starts = starts[order]
+            ends = ends[order]
+            # remove empty segments (see Segment.__nonzero__)
+            # and duplicate segments (consecutive, once sorted)
+            keep = ends - starts > SEGMENT_PRECISION
+            keep[1:] &= (starts[1:] != starts[:-1]) | (ends[1:] != ends[:-1])
+            starts = starts[keep]
+            ends = ends[keep]
+
+        self.__starts = starts
+        self.__ends = ends
+
+        # running maximum of end times and crop index, only computed when
+        # needed (see .__get_max_ends() and .__get_crop_index()) so that
+        # memory-mapped arrays are not read in full until then
+        self.__max_ends = None
+        self.__crop_index = None
+
+    def __get_video(self):
+        return self.__video
+    def __set_video(self, value):
+        self.__video = value
+    video = property(fget=__get_video, fset=__set_video)
+    """Path to (or any identifier of) segmented video"""
+
+    def __get_starts(self):
+        return self.__starts
+    starts = property(fget=__get_starts)
+    """Sorted segments start times (read-only array)"""
+
+    def __get_ends(self):
+        return self.__ends
+    ends = property(fget=__get_ends)
+    """Segments end times, in the same order as `starts` (read-only array)"""
+
+    def __len__(self):
+        """Use expression 'len(timeline)'"""
+        return len(self.__starts)
+
+    def __nonzero__(self):
+        """Use expression 'if timeline'"""
+        return len(self) > 0
+
+    def __iter__(self):
+        """Sorted segment iterator"""
+        for start, end in izip(self.__starts, self.__ends):
+            yield Segment(start=start, end=end)
+
+    def __reversed__(self):
+        """Reverse-sorted segment iterator"""
+        for start, end in izip(self.__starts[::-1], self.__ends[::-1]):
+            yield Segment(start=start, end=end)
+
+    def __getitem__(self, key):
+        """Use the expressions 'timeline[i]' or 'timeline[i:j]'
+
+        See Also
+        --------
+        Timeline.__getitem__
+
+        """
+        if isinstance(key, slice):
+            return [Segment(start=start, end=end) for start, end \
+                    in izip(self.__starts[key], self.__ends[key])]
+        return Segment(start=self.__starts[key], end=self.__ends[key])
+
+    def __position(self, segment):
+        """Position where `segment` is (or would be) -- O(log n)
+
+        Returns
+        -------
+        position : int
+        found : bool
+            True if `segment` is actually at this position.
+
+        """
+        # candidates share the same start time
+        i = np.searchsorted(self.__starts, segment.start, side='left')
+        j = np.searchsorted(self.__starts, segment.start, side='right')
+        k = i + np.searchsorted(self.__ends[i:j], segment.end, side='left')
+        return int(k), bool(k < j and self.__ends[k] == segment.end)
+
+    def index(self, segment):
+        """Find position of segment
+
+        See Also
+        --------
+        Timeline.index
+
+        """
+        if not isinstance(segment, Segment):
+            raise TypeError("unsupported type: '%s'. "
+                            "Must be Segment." % type(segment).__name__)
+
+        k, found = self.__position(segment)
+        if found:
+            return k
+        raise ValueError("timeline does not contain segment %s." % segment)
+
+    def __contains__(self, included):
+        """Use expression 'segment in timeline' or 'other in timeline'
+
+        See Also
+        --------
+        Timeline.__contains__
+
+        """
+        if isinstance(included, Segment):
+            try:
+                self.index(included)
+                return True
+            except ValueError, e:
+                return False
+
+        return all([segment in self for segment in included])
+
+    def __iadd__(self, other):
+        """Use expression 'timeline += other'
+
+        Add new segment(s) to the timeline.
+
+        Adding one segment costs O(n) since all arrays are copied, and 
+        adding m segments at once costs O((n+m) log(n+m)) since they are 
+        sorted again: add segments all at once rather than one at a time
+        (or build a Timeline first).
+
+        Parameters
+        ----------
+        other : Segment, Segment iterator or ColumnarTimeline
+
+        """
+
+        if isinstance(other, Segment):
+
+            # do nothing if segment is empty or already exists
+            if not other:
+                return self
+            k, found = self.__position(other)
+            if found:
+                return self
+
+            # insert segment where it belongs, no need to sort
+            self.__build(np.insert(self.__starts, k, other.start),
+                         np.insert(self.__ends, k, other.end),
+                         assume_sorted=True)
+            return self
+
+        if isinstance(other, (Timeline, ColumnarTimeline)) and \
+           self.video != other.video:
+            raise ValueError("video conflict:"
+                             "'%s' and '%s" % (self.video, other.video))
+
+        if isinstance(other, ColumnarTimeline):
+            starts, ends = other.starts, other.ends
+        else:
+            try:
+                other = list(other)
+                starts = [segment.start for segment in other]
+                ends = [segment.end for segment in other]
+            except Exception, e:
+                raise TypeError("unsupported operand type(s) for +=:"
+                                "must be Segment or Segment iterator.")
+
+        self.__build(np.concatenate([self.__starts, starts]),
+                     np.concatenate([self.__ends, ends]))
+        return self
+
+    def __add__(self, other):
+        """Use expression 'timeline + other'"""
+        timeline = self.copy()
+        timeline += other
+        return timeline
+
+    def __eq__(self, other):
+        """Use expression 'timeline1 == timeline2'"""
+        if isinstance(other, ColumnarTimeline):
+            return np.array_equal(self.__starts, other.starts) and \
+                   np.array_equal(self.__ends, other.ends)
+        if isinstance(other, Timeline):
+            return self == ColumnarTimeline.from_timeline(other)
+        return False
+
+    def __ne__(self, other):
+        """Use expression 'timeline1 != timeline2'"""
+        return not self == other
+
+    def __str__(self):
+        """Human-friendly representation"""
+        string = "[\n"
+        for segment in self:
+            string += "   %s\n" % segment
+        string += "]"
+        return string
+
+    def __repr__(self):
+        return "<ColumnarTimeline(%s)>" % self[:]
+
+    def empty(self):
+        """Empty copy of a timeline."""
+        return ColumnarTimeline(video=self.video)
+
+    def copy(self):
+        """Duplicate timeline."""
+        return ColumnarTimeline.from_arrays(self.__starts.copy(),
+                                            self.__ends.copy(),
+                                            video=self.video,
+                                            assume_sorted=True)
+
+    # ------------------------------------------------------------------- #
+
+    def __get_max_ends(self):
+        """Running maximum of end times"""
+        if self.__max_ends is None:
+            self.__max_ends = np.maximum.accumulate(self.__ends) \
+                              if len(self.__ends) else self.__ends
+        return self.__max_ends
+
+    def __get_crop_index(self):
+        """Sorted end times and max-tree over end times (see Timeline)"""
+        if self.__crop_index is None:
+            self.__crop_index = (np.sort(self.__ends),
+                                 _EndIndex(self.__ends))
+        return self.__crop_index
+
+    def __intersecting(self, segment):
+        """Positions of segments intersecting `segment`
+
+        Runs in O(log n + k) where k is the number of intersecting 
+        segments, unless a few long segments would make scanning 
+        candidates much longer -- O((k+1) log n) in this case.
+
+        See Also
+        --------
+        Timeline.view
+
+        """
+
+        # if segment is empty, it intersects nothing.
+        if not segment:
+            return np.array([], dtype=int)
+
+        # segments in [:index] start before segment ends
+        index = np.searchsorted(self.__starts,
+                                segment.end-SEGMENT_PRECISION, side='left')
+
+        # no segment in [:xedni] ends after segment starts
+        start = segment.start+SEGMENT_PRECISION
+        xedni = np.searchsorted(self.__get_max_ends(), start, side='left')
+
+        if index <= xedni:
+            return np.array([], dtype=int)
+
+        # (roughly) k segments out of those in [:index] end after segment 
+        # starts, as all the others end before segment starts
+        sorted_ends, end_index = self.__get_crop_index()
+        k = index - np.searchsorted(sorted_ends, start, side='left')
+
+        # scan candidates in [xedni:index] unless most of them end before
+        # segment starts (eg. because of a long segment before them)
+        if index - xedni <= 2 * k + 64:
+            positions = np.arange(xedni, index)
+            return positions[self.__ends[xedni:index] >= start]
+
+        return np.array(end_index.search(start, index), dtype=int)
+
+    def __call__(self, subset, mode='intersection'):
+        """Sub-timeline
+
+        Use expression 'timeline(subset, mode='intersection')
+
+        See Also
+        --------
+        Timeline.__call__
+
+        Examples
+        --------
+
+            >>> timeline = ColumnarTimeline([Segment(0, 1), Segment(1, 2),
+            ...                              Segment(1, 8), Segment(2, 3),
+            ...                              Segment(2, 4), Segment(6, 7)])
+            >>> print timeline(Segment(1.5, 6.5), mode='loose')
+            [
+               [1 --> 2]
+               [1 --> 8]
+               [2 --> 3]
+               [2 --> 4]
+               [6 --> 7]
+            ]
+            >>> print timeline(Segment(1.5, 3), mode='intersection')
+            [
+               [1.5 --> 2]
+               [1.5 --> 3]
+               [2 --> 3]
+            ]
+            >>> print timeline(Segment(1.5, 4), mode='strict')
+            [
+               [2 --> 3]
+               [2 --> 4]
+            ]
+
+        """
+
+        if isinstance(subset, Segment):
+            segment = subset
+            positions = self.__intersecting(segment)
+            starts = self.__starts[positions]
+            ends = self.__ends[positions]
+            if mode == 'strict':
+                inside = (starts >= segment.start) & (ends <= segment.end)
+                return ColumnarTimeline.from_arrays(starts[inside],
+                                                    ends[inside],
+                                                    video=self.video,
+                                                    assume_sorted=True)
+            elif mode == 'loose':
+                return ColumnarTimeline.from_arrays(starts, ends,
+                                                    video=self.video,
+                                                    assume_sorted=True)
+            elif mode == 'intersection':
+                return ColumnarTimeline.from_arrays(
+                                    np.maximum(starts, segment.start),
+                                    np.minimum(ends, segment.end),
+                                    video=self.video)
+            else:
+                raise ValueError('Unsupported mode (%s).' % mode)
+
+        elif isinstance(subset, (Timeline, ColumnarTimeline)):
+            starts = []
+            ends = []
+            for segment in subset.coverage():
+                timeline = self.__call__(segment, mode=mode)
+                starts.append(timeline.starts)
+                ends.append(timeline.ends)
+            return ColumnarTimeline.from_arrays(np.concatenate([[]] + starts),
+                                                np.concatenate([[]] + ends),
+                                                video=self.video)
+
+        raise TypeError("unsupported argument type: '%s'. Must be Segment "
+                        "or Timeline." % type(subset).__name__)
+
+    def __and__(self, other):
+        """Intersection of two timelines (or a timeline and a segment)
+
+        See Also
+        --------
+        Timeline.__and__
+
+        """
+        return self(other, mode='intersection').coverage()
+
+    def __or__(self, other):
+        """Union of two timelines (or a timeline and a segment)
+
+        See Also
+        --------
+        Timeline.__or__
+
+        """
+        return (self + other).coverage()
+
+    def extent(self):
+        """Timeline extent
+
+        See Also
+        --------
+        Timeline.extent
+
+        """
+        if self:
+            return Segment(start=self.__starts[0], end=np.max(self.__ends))
+        else:
+            return Segment()
+
+    def __coverage_arrays(self):
+        """Start and end times of coverage segments"""
+
+        if not self:
+            return self.__starts, self.__ends
+
+        # a new coverage segment starts whenever there is a gap between
+        # a segment and all the ones before it...
+        max_ends = self.__get_max_ends()
+        gap = self.__starts[1:] - max_ends[:-1] > SEGMENT_PRECISION
+        first = np.concatenate([[0], np.where(gap)[0]+1])
+        # ... and the previous one ends right before
+        last = np.concatenate([first[1:]-1, [len(self)-1]])
+        return self.__starts[first], max_ends[last]
+
+    def coverage(self):
+        """Timeline coverage
+
+        See Also
+        --------
+        Timeline.coverage
+
+        """
+        starts, ends = self.__coverage_arrays()
+        return ColumnarTimeline.from_arrays(starts, ends, video=self.video,
+                                            assume_sorted=True)
+
+    def duration(self):
+        """Timeline duration
+
+        See Also
+        --------
+        Timeline.duration
+
+        """
+        starts, ends = self.__coverage_arrays()
+        return float(np.sum(ends - starts))
+
+    def gaps(self, focus=None):
+        """Timeline gaps
+
+        See Also
+        --------
+        Timeline.gaps
+
+        """
+        if focus is None:
+            focus = self.extent()
+
+        if isinstance(focus, Segment):
+            # coverage cropped to focus
+            starts, ends = self.__coverage_arrays()
+            index = np.searchsorted(starts, focus.end, side='left')
+            xedni = np.searchsorted(ends, focus.start, side='right')
+            starts = np.maximum(starts[xedni:index], focus.start)
+            ends = np.minimum(ends[xedni:index], focus.end)
+            # gaps are in-between consecutive coverage segments
+            gap_starts = np.concatenate([[focus.start], ends])
+            gap_ends = np.concatenate([starts, [focus.end]])
+            keep = gap_ends - gap_starts > SEGMENT_PRECISION
+            return ColumnarTimeline.from_arrays(gap_starts[keep],
+                                                gap_ends[keep],
+                                                video=self.video,
+                                                assume_sorted=True)
+
+        elif isinstance(focus, (Timeline, ColumnarTimeline)):
+            starts = []
+            ends = []
+            for segment in focus.coverage():
+                gaps = self.gaps(focus=segment)
+                starts.append(gaps.starts)
+                ends.append(gaps.ends)
+            return ColumnarTimeline.from_arrays(np.concatenate([[]] + starts),
+                                                np.concatenate([[]] + ends),
+                                                video=self.video)
+
+        raise TypeError("unsupported operand type(s) for -':"
+                        "%s and Timeline." % type(focus).__name__)
+
+    def is_segmentation(self):
+        """Check whether timeline contains overlapping segments
+
+        See Also
+        --------
+        Timeline.is_segmentation
+
+        """
+        if len(self) < 2:
+            return True
+        max_ends = self.__get_max_ends()
+        overlap = max_ends[:-1] - self.__starts[1:] > SEGMENT_PRECISION
+        return not np.any(overlap)
+
+
+def _ranks(names):
+    """Rank of each name in sorted category table"""
+    order = sorted(range(len(names)), key=names.__getitem__)
+    rank = np.empty((len(names), ), dtype=int)
+    rank[order] = np.arange(len(names))
+    return rank
+
+
+def _sorted_rows(starts, ends, tracks, track_names):
+    """Check that rows are non-empty and sorted by segment, then track
+
+    Rows sharing the same segment and track are not considered sorted.
+
+    """
+
+    if not np.all(ends - starts > SEGMENT_PRECISION):
+        return False
+
+    ranks = _ranks(track_names)[tracks]
+    ds = starts[1:] - starts[:-1]
+    de = ends[1:] - ends[:-1]
+    dr = ranks[1:] - ranks[:-1]
+    return bool(np.all((ds > 0) |
+                       ((ds == 0) & ((de > 0) | ((de == 0) & (dr > 0))))))
+
+
+def _compact(names, ids):
+    """Check that category table is made of unique and used names only"""
+    if len(set(names)) != len(names):
+        return False
+    if len(ids) == 0:
+        return len(names) == 0
+    if ids.min() < 0:
+        return False
+    counts = np.bincount(ids)
+    return len(counts) == len(names) and bool(np.all(counts > 0))
+
+
+def _categories(names, ids):
+    """Merge duplicate names and remove unused ones from a category table
+
+    Parameters
+    ----------
+    names : list
+        Category table.
+    ids : numpy array
+        Indices in category table.
+
+    Returns
+    -------
+    names : list
+        Category table, with unique and used names only.
+    ids : numpy array
+        Corresponding indices in new category table.
+
+    """
+
+    names = list(names)
+
+    # merge duplicate names
+    index = {}
+    remap = np.array([index.setdefault(name, len(index)) for name in names],
+                     dtype=int)
+    unique = sorted(index, key=index.get)
+    if len(ids):
+        ids = remap[ids]
+
+    # remove unused names
+    used, ids = np.unique(ids, return_inverse=True)
+    return [unique[i] for i in used], ids.astype(int)
+
+
+class ColumnarAnnotation(object):
+    """
+    Annotated timeline, stored as contiguous arrays.
+
+    Same as Annotation, except that there is one row per (segment, track)
+    stored in four parallel arrays: start times, end times, track indices
+    and label indices. Tracks and labels themselves are stored only once,
+    in category tables (`track_names` and `label_names`).
+
+    Rows are sorted by segment, then by track. Bulk operations (extraction,
+    translation, copy) are vectorized; adding or removing one single label
+    rebuilds the arrays.
+
+    Parameters
+    ----------
+    multitrack : bool, optional
+        whether a segment can contain multiple track (True) or not (False).
+        Default is True (multi-track annotation).
+    modality : string, optional
+        name of annotated modality
+    video : string, optional
+        name of (audio or video) annotated document
+
+    Examples
+    --------
+
+        >>> annotation = ColumnarAnnotation(multitrack=True)
+        >>> annotation[Segment(0, 2), 'speaker1'] = 'Bernard'
+        >>> annotation[Segment(0, 2), 'speaker2'] = 'John'
+        >>> annotation[Segment(3, 4), 'speaker1'] = 'John'
+        >>> print annotation
+        [
+           [0 --> 2] speaker1 : Bernard
+                     speaker2 : John
+           [3 --> 4] speaker1 : John
+        ]
+        >>> print annotation('John')
+        [
+           [0 --> 2] speaker2 : John
+           [3 --> 4] speaker1 : John
+        ]
+        >>> print sorted(annotation.durations().items())
+        [('Bernard', 2.0), ('John', 3.0)]
+
+    """
+
+    def __init__(self, multitrack=True, video=None, modality=None):
+
+        super(ColumnarAnnotation, self).__init__()
+
+        # whether a segment can contain multiple track (True) or not (False)
+        self.__multitrack = multitrack
+
+        # name of annotated modality
+        self.__modality = modality
+
+        # path to (or any identifier of) segmented video
+        self.__video = video
+
+        self.__build([], [], [], [], [], [])
+
+    @classmethod
+    def from_arrays(cls, starts, ends, track_ids, label_ids,
+                    track_names, label_names,
+                    multitrack=True, video=None, modality=None):
+        """Create annotation from parallel arrays
+
+        Parameters
+        ----------
+        starts, ends : array-like
+            Segments start and end times, in seconds (one per row).
+        track_ids, label_ids : array-like
+            Track and label indices in `track_names` and `label_names`.
+        track_names, label_names : list
+            Category tables.
+        multitrack, video, modality :
+            See Annotation.
+
+        Returns
+        -------
+        annotation : ColumnarAnnotation
+            Rows with empty segments are removed. When several rows share the
+            same segment and track, only the last one is kept.
+
+        """
+        annotation = cls(multitrack=multitrack, video=video,
+                         modality=modality)
+        annotation.__build(starts, ends, track_ids, label_ids,
+                           track_names, label_names)
+        return annotation
+
+    @classmethod
+    def from_annotation(cls, annotation):
+        """Convert Annotation to ColumnarAnnotation
+
+        Examples
+        --------
+
+            >>> annotation = Annotation(multitrack=False)
+            >>> annotation[Segment(0, 2)] = 'Bernard'
+            >>> annotation[Segment(3, 4)] = 'Albert'
+            >>> print ColumnarAnnotation.from_annotation(annotation)
+            [
+               [0 --> 2] : Bernard
+               [3 --> 4] : Albert
+            ]
+
+        """
+        state = annotation.__getstate__()
+        return cls.from_arrays(state['starts'], state['ends'],
+                               state['tracks'], state['labels'],
+                               state['track_names'].tolist(),
+                               state['label_names'].tolist(),
+                               multitrack=annotation.multitrack,
+                               video=annotation.video,
+                               modality=annotation.modality)
+
+    def to_annotation(self):
+        """Convert to Annotation"""
+        annotation = Annotation.__new__(Annotation)
+        annotation.__setstate__({'multitrack': self.multitrack,
+                                 'video': self.video,
+                                 'modality': self.modality,
+                                 'starts': self.__starts,
+                                 'ends': self.__ends,
+                                 'tracks': self.__tracks,
+                                 'labels': self.__labels,
+                                 'track_names': npz.vocabulary(
+                                                        self.__track_names),
+                                 'label_names': npz.vocabulary(
+                                                        self.__label_names)})
+        return annotation
+
+    def save(self, path):
+        """Save annotation to disk, in compact .npz format
+
+        Same format as Annotation.save().
+
+        Parameters
+        ----------
+        path : str
+            Path to .npz file ('.npz' extension is appended if missing).
+
+        """
+        arrays = {'starts': self.__starts,
+                  'ends': self.__ends,
+                  'tracks': self.__tracks,
+                  'labels': self.__labels,
+                  'track_names': npz.vocabulary(self.__track_names),
+                  'label_names': npz.vocabulary(self.__label_names)}
+        for key in ['multitrack', 'video', 'modality']:
+            value = getattr(self, key)
+            if value is not None:
+                arrays[key] = np.array(value)
+        npz.save(path, **arrays)
+
+    @classmethod
+    def load(cls, path, mmap=True, allow_pickle=False):
+        """Load annotation saved with .save() (or Annotation.save())
+
+        Parameters
+        ----------
+        path : str
+            Path to .npz file ('.npz' extension is appended if missing).
+        mmap : bool, optional
+            Memory-map rows (read-only) instead of reading them into memory.
+            Only category tables are always read. Defaults to True.
+        allow_pickle : bool, optional
+            Allow loading tracks and labels that were pickled (eg. Unknown
+            labels). Only set it to True for trusted files.
+            Defaults to False.
+
+        Returns
+        -------
+        annotation : ColumnarAnnotation
+
+        Examples
+        --------
+
+            >>> import tempfile, os
+            >>> path = os.path.join(tempfile.mkdtemp(), 'annotation')
+            >>> annotation = ColumnarAnnotation(multitrack=True)
+            >>> annotation[Segment(0, 2), 'speaker1'] = 'Bernard'
+            >>> annotation[Segment(3, 4), 'speaker1'] = 'John'
+            >>> annotation.save(path)
+            >>> print ColumnarAnnotation.load(path)
+            [
+               [0 --> 2] speaker1 : Bernard
+               [3 --> 4] speaker1 : John
+            ]
+
+        """
+
+        arrays = npz.load(path, mmap=mmap, allow_pickle=allow_pickle)
+
+        attributes = {}
+        for key in ['multitrack', 'video', 'modality']:
+            value = arrays.get(key, None)
+            attributes[key] = None if value is None else value.item()
+        annotation = cls(**attributes)
+
+        rows = [arrays['starts'], arrays['ends'],
+                arrays['tracks'], arrays['labels'],
+                arrays['track_names'].tolist(), arrays['label_names'].tolist()]
+
+        # rows saved by .save() are already sorted (not always the case of
+        # those saved by Annotation.save(), whose tracks are not sorted)
+        starts, ends, tracks, labels, track_names, label_names = rows
+        assume_sorted = _compact(track_names, tracks) and \
+                        _compact(label_names, labels) and \
+                        _sorted_rows(starts, ends, tracks, track_names)
+        annotation.__build(*rows, assume_sorted=assume_sorted)
+        return annotation
+
+    def __build(self, starts, ends, tracks, labels, track_names, label_names,
+                assume_sorted=False):
+
+        # no copy (eg. of memory-mapped arrays) unless needed
+        starts = np.asarray(starts, dtype=np.float64).ravel()
+        ends = np.asarray(ends, dtype=np.float64).ravel()
+        tracks = np.asarray(tracks, dtype=int).ravel()
+        labels = np.asarray(labels, dtype=int).ravel()
+
+        if not (len(starts) == len(ends) == len(tracks) == len(labels)):
+            raise ValueError('all arrays must have the same length.')
+
+        if assume_sorted:
+            # rows are sorted, unique, non-empty and category tables are 
+            # made of unique and used names (eg. saved by .save())
+            track_names = list(track_names)
+            label_names = list(label_names)
+
+        else:
+            track_names, tracks = _categories(track_names, tracks)
+            label_names, labels = _categories(label_names, labels)
+
+        if len(starts) > 0 and not assume_sorted:
+
+            # rank of each track in sorted track table
+            rank = _ranks(track_names)
+
+            # sort by segment first, then by track (then by original position)
+            order = np.lexsort((np.arange(len(starts)), rank[tracks],
+                                ends, starts))
+            starts = starts[order]
+            ends = ends[order]
+            tracks = tracks[order]
+            labels = labels[order]
+
+            # remove empty segments (see Segment.__nonzero__)
+            # and all but the last of rows sharing the same segment and track
+            keep = ends - starts > SEGMENT_PRECISION
+            keep[:-1] &= (starts[1:] != starts[:-1]) | \
+                         (ends[1:] != ends[:-1]) | \
+                         (tracks[1:] != tracks[:-1])
+            starts = starts[keep]
+            ends = ends[keep]
+            track_names, tracks = _categories(track_names, tracks[keep])
+            label_names, labels = _categories(label_names, labels[keep])
+
+        self.__starts = starts
+        self.__ends = ends
+        self.__tracks = tracks
+        self.__labels = labels
+        self.__track_names = track_names
+        self.__label_names = label_names
+
+        # position of first row of each segment
+        new = np.ones((len(starts), ), dtype=bool)
+        new[1:] = (starts[1:] != starts[:-1]) | (ends[1:] != ends[:-1])
+        self.__first = np.where(new)[0]
+
+    def __get_multitrack(self):
+        return self.__multitrack
+    multitrack = property(fget=__get_multitrack)
+    """Can segments contain multiple tracks?"""
+
+    def __get_video(self):
+        return self.__video
+    video = property(fget=__get_video)
+    """Path to (or any identifier of) annotated video"""
+
+    def __get_modality(self):
+        return self.__modality
+    modality = property(fget=__get_modality)
+    """Name (or any identifier) of annotated modality"""
+
+    def __get_starts(self):
+        return self.__starts
+    starts = property(fget=__get_starts)
+    """Start time of each row (read-only array)"""
+
+    def __get_ends(self):
+        return self.__ends
+    ends = property(fget=__get_ends)
+    """End time of each row (read-only array)"""
+
+    def __get_track_ids(self):
+        return self.__tracks
+    track_ids = property(fget=__get_track_ids)
+    """Track of each row, as index in `track_names` (read-only array)"""
+
+    def __get_label_ids(self):
+        return self.__labels
+    label_ids = property(fget=__get_label_ids)
+    """Label of each row, as index in `label_names` (read-only array)"""
+
+    def __get_track_names(self):
+        return list(self.__track_names)
+    track_names = property(fget=__get_track_names)
+    """Track category table"""
+
+    def __get_label_names(self):
+        return list(self.__label_names)
+    label_names = property(fget=__get_label_names)
+    """Label category table"""
+
+    def __get_timeline(self):
+        return ColumnarTimeline.from_arrays(self.__starts[self.__first],
+                                            self.__ends[self.__first],
+                                            video=self.video,
+                                            assume_sorted=True)
+    timeline = property(fget=__get_timeline)
+    """Timeline of annotated segments (as a ColumnarTimeline)"""
+
+    def labels(self):
+        """Global list of labels
+
+        See Also
+        --------
+        Annotation.labels
+
+        """
+        return sorted(self.__label_names, key=str)
+
+    def __rows(self, segment):
+        """Range of rows of `segment`"""
+        i = np.searchsorted(self.__starts, segment.start, side='left')
+        j = np.searchsorted(self.__starts, segment.start, side='right')
+        k = i + np.searchsorted(self.__ends[i:j], segment.end, side='left')
+        l = i + np.searchsorted(self.__ends[i:j], segment.end, side='right')
+        return int(k), int(l)
+
+    def get_labels(self, segment):
+        """Local set of labels
+
+        See Also
+        --------
+        Annotation.get_labels
+
+        """
+        i, j = self.__rows(segment)
+        return set([self.__label_names[l] for l in self.__labels[i:j]])
+
+    def __parse_key(self, key):
+
+        if self.multitrack:
+            if not isinstance(key, tuple) or len(key) != 2:
+                raise KeyError("multi-track annotation, "
+                               "expected 'annotation[segment, track]'")
+            return key
+
+        if not isinstance(key, Segment):
+            raise KeyError("single-track annotation, "
+                           "expected 'annotation[segment]'")
+        return key, UNIQUE_TRACK
+
+    def __getitem__(self, key):
+        """Use expression 'annotation[segment]' for single-track annotation
+        and 'annotation[segment, track]' for multi-track annotation
+
+        See Also
+        --------
+        Annotation.__getitem__
+
+        """
+
+        segment, track = self.__parse_key(key)
+        i, j = self.__rows(segment)
+        if i == j:
+            raise KeyError(segment)
+
+        # annotation[segment, :] returns {track --> label} dictionary
+        if track == slice(None, None, None):
+            return dict([(self.__track_names[t], self.__label_names[l])
+                         for t, l in izip(self.__tracks[i:j],
+                                          self.__labels[i:j])])
+
+        for t, l in izip(self.__tracks[i:j], self.__labels[i:j]):
+            if self.__track_names[t] == track:
+                return self.__label_names[l]
+        raise KeyError(track)
+
+    def __setitem__(self, key, label):
+        """Add/update label -- O(n)
+
+        See Also
+        --------
+        Annotation.__setitem__
+
+        """
+
+        segment, track = self.__parse_key(key)
+
+        if not (isinstance(segment, Segment) and segment):
+            raise KeyError("invalid segment.")
+        if not isinstance(track, Hashable):
+            raise KeyError('invalid track name.')
+        if not isinstance(label, (Unknown, str)):
+            raise ValueError('invalid label.')
+
+        # new row comes last: it replaces existing one, if any
+        self.__build(np.append(self.__starts, segment.start),
+                     np.append(self.__ends, segment.end),
+                     np.append(self.__tracks, len(self.__track_names)),
+                     np.append(self.__labels, len(self.__label_names)),
+                     self.__track_names + [track],
+                     self.__label_names + [label])
+
+    def __delitem__(self, key):
+        """Remove label -- O(n)
+
+        See Also
+        --------
+        Annotation.__delitem__
+
+        """
+
+        segment, track = self.__parse_key(key)
+        i, j = self.__rows(segment)
+        keep = np.ones((len(self.__starts), ), dtype=bool)
+
+        if track == slice(None, None, None):
+            keep[i:j] = False
+        else:
+            for k in xrange(i, j):
+                if self.__track_names[self.__tracks[k]] == track:
+                    keep[k] = False
+
+        if np.all(keep):
+            raise KeyError(key)
+
+        self.__select(keep, self)
+
+    def __select(self, keep, annotation):
+        """Fill `annotation` with selected rows (boolean mask)"""
+        annotation.__build(self.__starts[keep], self.__ends[keep],
+                           self.__tracks[keep], self.__labels[keep],
+                           self.__track_names, self.__label_names)
+        return annotation
+
+    def __len__(self):
+        """Number of annotated segments"""
+        return len(self.__first)
+
+    def __nonzero__(self):
+        return len(self.__starts) > 0
+
+    def __contains__(self, included):
+        """Use expression 'segment in annotation'"""
+        i, j = self.__rows(included)
+        return i < j
+
+    def __iter__(self):
+        """Sorted segment iterator"""
+        for start, end in izip(self.__starts[self.__first],
+                               self.__ends[self.__first]):
+            yield Segment(start=start, end=end)
+
+    def iterlabels(self):
+        """Iterate over segment/track/label triplets, sorted by segment
+
+        See Also
+        --------
+        Annotation.iterlabels
+
+        """
+
+        segment = None
+        for start, end, t, l in izip(self.__starts, self.__ends,
+                                     self.__tracks, self.__labels):
+            if segment is None or segment.start != start or \
+               segment.end != end:
+                segment = Segment(start=start, end=end)
+            if self.multitrack:
+                yield segment, self.__track_names[t], self.__label_names[l]
+            else:
+                yield segment, self.__label_names[l]
+
+    def __str__(self):
+        """Human-friendly representation"""
+
+        string = "[\n"
+        previous = None
+        for row in self.iterlabels():
+            segment = row[0]
+            if previous is None or segment != previous:
+                previous = segment
+                prefix = str(segment)
+            else:
+                prefix = ' ' * len(str(segment))
+            if self.multitrack:
+                string += '   %s %s : %s\n' % (prefix, row[1], row[2])
+            else:
+                string += '   %s : %s\n' % (prefix, row[1])
+        string += "]"
+        return string
+
+    def empty(self):
+        """Empty copy of an annotation."""
+        return ColumnarAnnotation(multitrack=self.multitrack,
+                                  video=self.video,
+                                  modality=self.modality)
+
+    def copy(self, segment_func=None, track_func=None, label_func=None):
+        """Duplicate annotation
+
+        `track_func` and `label_func` are applied once per track and label
+        (and not once per row).
+
+        See Also
+        --------
+        Annotation.copy
+
+        """
+
+        track_names = self.__track_names
+        if track_func is not None:
+            track_names = [track_func(track) for track in track_names]
+
+        label_names = self.__label_names
+        if label_func is not None:
+            label_names = [label_func(label) for label in label_names]
+
+        starts = self.__starts
+        ends = self.__ends
+        tracks = self.__tracks
+        labels = self.__labels
+
+        if segment_func is not None:
+            keep = np.zeros((len(starts), ), dtype=bool)
+            starts = np.array(starts)
+            ends = np.array(ends)
+            for k, segment in enumerate(Segment(start=start, end=end)
+                                        for start, end
+                                        in izip(self.__starts, self.__ends)):
+                segment = segment_func(segment)
+                if segment:
+                    keep[k] = True
+                    starts[k] = segment.start
+                    ends[k] = segment.end
+            starts = starts[keep]
+            ends = ends[keep]
+            tracks = tracks[keep]
+            labels = labels[keep]
+
+        return ColumnarAnnotation.from_arrays(starts.copy(), ends.copy(),
+                                              tracks.copy(), labels.copy(),
+                                              track_names, label_names,
+                                              multitrack=self.multitrack,
+                                              video=self.video,
+                                              modality=self.modality)
+
+    def __mod__(self, translation):
+        """Translate labels
+
+        See Also
+        --------
+        Annotation.__mod__
+
+        """
+
+        if not isinstance(translation, (dict, Mapping)):
+            raise TypeError("unsupported operand types(s) for '\%': "
+                            "ColumnarAnnotation and %s" % \
+                            type(translation).__name__)
+
+        return self.copy(label_func=_label_func(translation))
+
+    def __call__(self, subset, mode='strict', invert=False):
+        """Sub-annotation extraction
+
+        See Also
+        --------
+        Annotation.__call__
+
+        """
+
+        if isinstance(subset, Segment):
+            subset = ColumnarTimeline([subset], video=self.video)
+
+        if isinstance(subset, Timeline):
+            subset = ColumnarTimeline.from_timeline(subset)
+
+        if isinstance(subset, ColumnarTimeline):
+
+            if invert:
+                raise NotImplementedError('')
+
+            coverage = subset.coverage()
+            c_starts, c_ends = coverage.starts, coverage.ends
+            starts, ends = self.__starts, self.__ends
+
+            if not coverage:
+                keep = np.zeros((len(starts), ), dtype=bool)
+
+            elif mode == 'strict':
+                # keep row if it is fully included in one coverage segment
+                # (the last one starting before it)
+                k = np.searchsorted(c_starts, starts, side='right') - 1
+                keep = (k >= 0) & (ends <= c_ends[np.maximum(k, 0)])
+
+            elif mode == 'loose':
+                # keep row if it intersects one coverage segment
+                # (the last one starting before it ends, or the one before)
+                k = np.searchsorted(c_starts, ends, side='left') - 1
+                keep = np.zeros((len(starts), ), dtype=bool)
+                for shift in [0, 1]:
+                    i = np.maximum(k - shift, 0)
+                    overlap = np.minimum(ends, c_ends[i]) - \
+                              np.maximum(starts, c_starts[i])
+                    keep |= (k - shift >= 0) & (overlap > SEGMENT_PRECISION)
+
+            else:
+                raise ValueError('unsupported mode.')
+
+            return self.__select(keep, self.empty())
+
+        # one single label == set of one label
+        if not isinstance(subset, (tuple, list, set)):
+            subset = set([subset])
+
+        subset = set(subset)
+        selected = [l for l, label in enumerate(self.__label_names)
+                    if label in subset]
+        keep = np.in1d(self.__labels, selected)
+        if invert:
+            keep = ~keep
+
+        return self.__select(keep, self.empty())
+
+    def durations(self):
+        """Total duration of each label
+
+        Returns
+        -------
+        durations : dict
+            Duration of each label coverage, in seconds, indexed by label.
+
+        """
+
+        durations = {}
+
+        # group rows by label (keeping them sorted by segment)
+        order = np.argsort(self.__labels, kind='mergesort')
+        labels = self.__labels[order]
+        bounds = np.searchsorted(labels, np.arange(len(self.__label_names)+1))
+
+        for l, label in enumerate(self.__label_names):
+            rows = order[bounds[l]:bounds[l+1]]
+            starts = self.__starts[rows]
+            ends = self.__ends[rows]
+            # same as ColumnarTimeline coverage
+            max_ends = np.maximum.accumulate(ends)
+            gap = starts[1:] - max_ends[:-1] > SEGMENT_PRECISION
+            first = np.concatenate([[0], np.where(gap)[0]+1])
+            last = np.concatenate([first[1:]-1, [len(rows)-1]])
+            durations[label] = float(np.sum(max_ends[last] - starts[first]))
+
+        return durations
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright 2012 Herve BREDIN (bredin@limsi.fr)
+
+# This file is part of PyAnnote.
+#
+#     PyAnnote is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     PyAnnote is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with PyAnnote.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+The ``pyannote.base.npz`` module stores named NumPy arrays in (uncompressed)
+``.npz`` archives, and loads them back as memory-mapped arrays.
+
+``numpy.load`` ignores `mmap_mode` for ``.npz`` archives. However, since
+arrays are stored uncompressed, each of them is one contiguous chunk of the
+archive that can be memory-mapped directly.
+
+Object arrays (eg. vocabularies of Unknown labels) are pickled, and are only
+loaded back when the caller explicitly allows it -- since unpickling may run
+arbitrary code from a malicious archive.
+
+"""
+
+import struct
+import zipfile
+import numpy as np
+from numpy.lib import format as npy
+
+# size of zip local file header (before file name and extra field)
+ZIP_LOCAL_HEADER_SIZE = 30
+
+
+def vocabulary(values):
+    """Array of (hashable) values, typed whenever possible
+
+    Returns a string or numeric array when it stores `values` losslessly,
+    and an object array otherwise (eg. for mixed types or Unknown labels).
+    Object arrays cannot be memory-mapped and rely on pickle.
+
+    Parameters
+    ----------
+    values : list
+
+    Returns
+    -------
+    array : numpy array
+
+    """
+    values = list(values)
+    try:
+        array = np.array(values)
+    except Exception:
+        array = None
+
+    if array is not None and array.ndim == 1 and not array.dtype.hasobject:
+        converted = array.tolist()
+        if converted == values and \
+           [type(v) for v in converted] == [type(v) for v in values]:
+            return array
+
+    array = np.empty((len(values),), dtype=object)
+    array[:] = values
+    return array
+
+
+def _path(path):
+    """Archive path, with '.npz' extension"""
+    if isinstance(path, basestring) and not path.endswith('.npz'):
+        path = path + '.npz'
+    return path
+
+
+def save(path, **arrays):
+    """Save named arrays into an uncompressed .npz archive
+
+    Parameters
+    ----------
+    path : str or file
+        Archive path. '.npz' extension is appended if missing.
+    arrays : numpy arrays
+
+    """
+    np.savez(_path(path), **arrays)
+
+
+def _map(path, f, info):
+    """Memory-map one archive member (None if it cannot be mapped)"""
+
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+
+    # skip local file header
+    f.seek(info.header_offset)
+    header = f.read(ZIP_LOCAL_HEADER_SIZE)
+    name_length, extra_length = struct.unpack('<HH', header[26:30])
+    f.seek(info.header_offset + ZIP_LOCAL_HEADER_SIZE + \
+           name_length + extra_length)
+
+    # read .npy header
+    version = npy.read_magic(f)
+    if version == (1, 0):
+        shape, fortran_order, dtype = npy.read_array_header_1_0(f)
+    else:
+        shape, fortran_order, dtype = npy.read_array_header_2_0(f)
+
+    # objects are pickled, and empty arrays cannot be mapped
+    if dtype.hasobject or len(shape) == 0 or np.prod(shape) == 0:
+        return None
+
+    return np.memmap(path, dtype=dtype, mode='r', offset=f.tell(),
+                     shape=shape, order='F' if fortran_order else 'C')
+
+
+def load(path, mmap=True, allow_pickle=False):
+    """Load named arrays from a .npz archive
+
+    Parameters
+    ----------
+    path : str
+        Archive path. '.npz' extension is appended if missing.
+    mmap : bool, optional
+        When True (default), arrays are memory-mapped (read-only) instead of
+        being read into memory. Object, empty and 0-d arrays are always read.
+    allow_pickle : bool, optional
+        Allow loading object arrays, which are pickled. Only set it to True
+        for trusted archives. Defaults to False.
+
+    Returns
+    -------
+    arrays : dict
+        Arrays indexed by name.
+
+    Raises
+    ------
+    ValueError if archive contains object arrays and `allow_pickle` is False
+
+    """
+
+    path = _path(path)
+    arrays = {}
+
+    archive = np.load(path, allow_pickle=allow_pickle)
+    try:
+
+        mapped = {}
+        if mmap:
+            with zipfile.ZipFile(path) as zf, open(path, 'rb') as f:
+                for info in zf.infolist():
+                    name = info.filename
+                    if name.endswith('.npy'):
+                        name = name[:-4]
+                    mapped[name] = _map(path, f, info)
+
+        for name in archive.files:
+            if mapped.get(name) is not None:
+                arrays[name] = mapped[name]
+            else:
+                arrays[name] = archive[name]
+
+    finally:
+        archive.close()
+
+    return arrays
@@ -24,6 +24,9 @@ class Segment(object):
     """
     Temporal interval defined by its `start` and `end` times.
     
+    Segments are immutable: they can safely be used as dictionary keys or set
+    elements (and shared between timelines and annotations).
+    
     Multiple segment operators are available -- including intersection (&),
     inclusion (in), emptiness test, start/end time shifting (+, -, >>, <<). 
     They are illustrated in **Examples** section.
@@ -108,42 +111,38 @@ class Segment(object):
     
     """
     
+    # no per-instance __dict__: `start` and `end` are the only attributes
+    # and they are accessed directly (no property indirection)
+    __slots__ = ('start', 'end')
+    
     def __init__(self, start=0., end=0.):
-        super(Segment, self).__init__()
-        self._start = float(start)
-        self._end   = float(end)
-    
-    def _get_start(self): 
-        return self._start
-    def _set_start(self, value):
-        self._start = value
-    start = property(fget=_get_start, fset=_set_start, fdel=None)
-    """Start time, in seconds.
-
-    Examples
-    --------
-
-    >>> segment = Segment(start=13., end=37)
-    >>> print segment.start
-    13
-    >>> segment.start = 36
-    >>> print segment
-    [36 --> 37]
-
-    """
+        # bypass .__setattr__() which prevents any further modification
+        object.__setattr__(self, 'start', float(start))
+        object.__setattr__(self, 'end', float(end))
     
-    def _get_end(self): 
-        return self._end
-    def _set_end(self, value):
-        self._end = value
-    end = property(fget=_get_end, fset=_set_end)
-    """Get/set end time, in seconds.
+    def __setattr__(self, name, value):
+        """Segments are immutable
+        
+        Examples
+        --------
+        
+        >>> segment = Segment(start=13., end=37)
+        >>> print segment.start
+        13.0
+        >>> segment.start = 36
+        Traceback (most recent call last):
+        ...
+        AttributeError: Segment is immutable.
+        
+        """
+        raise AttributeError('%s is immutable.' % type(self).__name__)
     
-    See Also
-    --------
-    pyannote.base.segment.Segment.start
-
-    """
+    def __delattr__(self, name):
+        raise AttributeError('%s is immutable.' % type(self).__name__)
+    
+    def __reduce__(self):
+        """Support for pickle (and copy) despite immutability"""
+        return (Segment, (self.start, self.end))
     
     def __nonzero__(self):
         """Use the expression 'if segment'
@@ -168,7 +167,12 @@ class Segment(object):
     """Get segment middle time, in seconds."""
     
     def copy(self):
-        """Duplicate segment."""
+        """Duplicate segment.
+        
+        Since segments are immutable, this is only useful to convert a 
+        RevSegment back to a Segment.
+        
+        """
         return Segment(start=self.start, end=self.end)
     
     def __lt__(self, other):
@@ -203,7 +207,7 @@ class Segment(object):
         return other.__lt__(self)
     
     def __hash__(self):
-        return hash(self.start)
+        return hash((self.start, self.end))
         
     # ------------------------------------------------------- #
     # Inclusion (in), intersection (&), union (|) and gap (^) #
@@ -426,6 +430,8 @@ class RevSegment(Segment):
     """Reversed segment.
     """
     
+    __slots__ = ()
+    
     def __init__(self, segment):
         super(RevSegment, self).__init__(start=segment.start, end=segment.end)    
     def __lt__(self, other):
@@ -450,6 +456,9 @@ class RevSegment(Segment):
         return (self.start != other.start) or \
                (self.end != other.end)
     
+    def __reduce__(self):
+        return (RevSegment, (Segment(self.start, self.end), ))
+    
     def __sub__(self, other):
         if isinstance(other, RevSegment):
             return self.end - other.end
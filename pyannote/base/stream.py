@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# Copyright 2012 Herve BREDIN (bredin@limsi.fr)
+
+# This file is part of PyAnnote.
+#
+#     PyAnnote is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     PyAnnote is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with PyAnnote.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+The ``pyannote.base.stream`` module provides set operations over sorted
+segment iterators (eg. coming straight from a parser).
+
+Every function is a generator: segments are consumed and yielded lazily,
+and only a bounded number of segments is kept in memory at any time.
+Input segments must be sorted by start time -- as Timeline segments are.
+
+    >>> A = [Segment(0, 2), Segment(1, 3), Segment(6, 8)]
+    >>> B = [Segment(2, 7)]
+    >>> print list(coverage(A))
+    [<Segment(0, 3)>, <Segment(6, 8)>]
+    >>> print list(intersection(A, B))
+    [<Segment(2, 3)>, <Segment(6, 7)>]
+    >>> print list(gaps(A))
+    [<Segment(3, 6)>]
+
+"""
+
+from heapq import merge
+from segment import Segment
+
+
+def _sorted(segments):
+    """Check (lazily) that segments are sorted by start time
+
+    Empty segments are skipped.
+
+    Raises
+    ------
+    ValueError if segments are not sorted
+
+    """
+    previous = None
+    for segment in segments:
+        if not segment:
+            continue
+        if previous is not None and segment.start < previous.start:
+            raise ValueError('segments must be sorted (%s comes after %s).'
+                             % (segment, previous))
+        previous = segment
+        yield segment
+
+
+def coverage(segments):
+    """Coverage of sorted segments
+
+    Parameters
+    ----------
+    segments : Segment iterator
+        Segments sorted by start time.
+
+    Returns
+    -------
+    coverage : Segment generator
+        Sorted, non-overlapping segments with no gap between them merged
+        into one.
+
+    Examples
+    --------
+
+        >>> segments = [Segment(0, 1), Segment(1, 3), Segment(2, 4),
+        ...             Segment(6, 7)]
+        >>> for segment in coverage(segments):
+        ...     print segment
+        [0 --> 4]
+        [6 --> 7]
+
+    """
+
+    current = None
+
+    for segment in _sorted(segments):
+
+        if current is None:
+            current = segment
+
+        # If there is no gap between current segment and next segment,
+        # extend current segment using next segment
+        elif not (segment ^ current):
+            current |= segment
+
+        # If there actually is a gap, current segment is complete
+        else:
+            yield current
+            current = segment
+
+    if current is not None:
+        yield current
+
+
+def union(*streams):
+    """Union of sorted segment iterators
+
+    Parameters
+    ----------
+    streams : Segment iterators
+        Segments sorted by start time.
+
+    Returns
+    -------
+    union : Segment generator
+        Coverage of the union of all streams.
+
+    Examples
+    --------
+
+        >>> A = [Segment(0, 2), Segment(4, 6)]
+        >>> B = [Segment(1, 3), Segment(7, 8)]
+        >>> for segment in union(A, B):
+        ...     print segment
+        [0 --> 3]
+        [4 --> 6]
+        [7 --> 8]
+
+    """
+    return coverage(merge(*[_sorted(stream) for stream in streams]))
+
+
+def intersection(A, B):
+    """Intersection of two sorted segment iterators
+
+    Parameters
+    ----------
+    A, B : Segment iterators
+        Segments sorted by start time.
+
+    Returns
+    -------
+    intersection : Segment generator
+        Coverage of the intersection of both streams.
+
+    Examples
+    --------
+
+        >>> A = [Segment(0, 2), Segment(4, 6)]
+        >>> B = [Segment(1, 5), Segment(5.5, 8)]
+        >>> for segment in intersection(A, B):
+        ...     print segment
+        [1 --> 2]
+        [4 --> 5]
+        [5.5 --> 6]
+
+    """
+
+    A = coverage(A)
+    B = coverage(B)
+    a = next(A, None)
+    b = next(B, None)
+
+    while a is not None and b is not None:
+        segment = a & b
+        if segment:
+            yield segment
+        # move forward in the stream whose segment ends first
+        if a.end < b.end:
+            a = next(A, None)
+        else:
+            b = next(B, None)
+
+
+def difference(A, B):
+    """Difference of two sorted segment iterators
+
+    Parameters
+    ----------
+    A, B : Segment iterators
+        Segments sorted by start time.
+
+    Returns
+    -------
+    difference : Segment generator
+        Coverage of the part of `A` not covered by `B`.
+
+    Examples
+    --------
+
+        >>> A = [Segment(0, 2), Segment(4, 6)]
+        >>> B = [Segment(1, 5)]
+        >>> for segment in difference(A, B):
+        ...     print segment
+        [0 --> 1]
+        [5 --> 6]
+
+    """
+
+    B = coverage(B)
+    b = next(B, None)
+
+    for a in coverage(A):
+
+        start = a.start
+
+        # skip segments of B ending before a starts
+        while b is not None and b.end <= start:
+            b = next(B, None)
+
+        # remove every segment of B starting before a ends
+        while b is not None and b.start < a.end:
+            segment = Segment(start=start, end=b.start)
+            if segment:
+                yield segment
+            start = max(start, b.end)
+            # b may also overlap next segment of A
+            if b.end > a.end:
+                break
+            b = next(B, None)
+
+        # keep what remains of a
+        segment = Segment(start=start, end=a.end)
+        if segment:
+            yield segment
+
+
+def gaps(segments, focus=None):
+    """Gaps of sorted segments
+
+    Parameters
+    ----------
+    segments : Segment iterator
+        Segments sorted by start time.
+    focus : Segment or Segment iterator, optional
+        Only yield gaps within `focus` (sorted by start time, if iterator).
+        Defaults to the extent of `segments`.
+
+    Returns
+    -------
+    gaps : Segment generator
+        Sorted gaps between segments.
+
+    Examples
+    --------
+
+        >>> segments = [Segment(1, 3), Segment(2, 4), Segment(6, 7)]
+        >>> for segment in gaps(segments, focus=Segment(0, 10)):
+        ...     print segment
+        [0 --> 1]
+        [4 --> 6]
+        [7 --> 10]
+
+    """
+
+    if focus is None:
+        previous = None
+        for segment in coverage(segments):
+            if previous is not None:
+                yield previous ^ segment
+            previous = segment
+        return
+
+    if isinstance(focus, Segment):
+        focus = [focus]
+
+    for segment in difference(focus, segments):
+        yield segment
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
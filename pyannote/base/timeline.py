@@ -18,11 +18,228 @@
 #     You should have received a copy of the GNU General Public License
 #     along with PyAnnote.  If not, see <http://www.gnu.org/licenses/>.
 
-# TODO: Faster implementation of .__contains__() (for use in .__iadd__()) 
-#       Possibly with an additional interal set of segments?
-#       or with interpolated binary search.
-
+from bisect import bisect_left, bisect_right
+from numbers import Integral
+from heapq import merge
+from itertools import groupby
+from operator import itemgetter
+import numpy as np
 from segment import Segment, RevSegment, SEGMENT_PRECISION
+import stream
+import npz
+
+def _depth(starts, ends, weights=None):
+    """Piecewise-constant profile of the number of active intervals
+    
+    Parameters
+    ----------
+    starts, ends : array-like
+        Start and end times of intervals.
+    weights : array-like, optional
+        Contribution of each interval. Defaults to 1.
+    
+    Returns
+    -------
+    boundaries : numpy array
+        Sorted unique boundaries.
+    counts : numpy array
+        counts[i] is the (weighted) number of intervals active between
+        boundaries[i] and boundaries[i+1].
+    
+    """
+    
+    n = len(starts)
+    if n == 0:
+        return np.array([], dtype=np.float64), np.array([], dtype=int)
+    
+    if weights is None:
+        weights = np.ones(n, dtype=int)
+    weights = np.asarray(weights)
+    
+    # start events (+weight) and end events (-weight), sorted by time
+    times = np.concatenate([np.asarray(starts, dtype=np.float64), 
+                            np.asarray(ends, dtype=np.float64)])
+    deltas = np.concatenate([weights, -weights])
+    order = np.argsort(times, kind='mergesort')
+    times = times[order]
+    active = np.cumsum(deltas[order])
+    
+    # only keep the number of active intervals after the last event
+    # of each boundary (the one after the very last boundary is zero)
+    last = np.concatenate([times[1:] != times[:-1], [True]])
+    return times[last], active[last][:-1]
+
+
+class _EndIndex(object):
+    """Interval index over the end times of sorted segments
+    
+    Max-tree over segment positions: leaf i stores the end time of the i.th
+    segment and every other node stores the greatest end time of its two
+    children. Segments ending after a given time are therefore found without
+    scanning those that do not -- however long a few other segments may be.
+    
+    Inserting (or deleting) one segment only shifts the leaves after it.
+    Their ancestors are updated on next query (one vectorized operation per
+    tree level), so that a bunch of insertions or deletions only pays for 
+    it once.
+    
+    Parameters
+    ----------
+    ends : array-like, optional
+        End times of segments, in timeline order.
+    
+    """
+    
+    def __init__(self, ends=()):
+        super(_EndIndex, self).__init__()
+        self.__build(np.asarray(ends, dtype=np.float64))
+    
+    def __build(self, ends):
+        
+        self.__n = len(ends)
+        
+        # number of leaves is the smallest power of 2 that fits all segments
+        # (spare leaves are set to -inf so that they are never reported)
+        capacity = 1
+        while capacity < self.__n:
+            capacity *= 2
+        leaves = np.empty((capacity, ), dtype=np.float64)
+        leaves.fill(-np.inf)
+        leaves[:self.__n] = ends
+        
+        # .__levels[0] are the leaves, .__levels[-1] is the root
+        self.__levels = [leaves]
+        while len(self.__levels[-1]) > 1:
+            children = self.__levels[-1]
+            self.__levels.append(np.maximum(children[0::2], children[1::2]))
+        
+        # ancestors of leaves[lo:hi] are not up to date, with (lo, hi) the
+        # value of .__dirty (None when the whole tree is up to date)
+        self.__dirty = None
+    
+    def __update(self):
+        """Update ancestors of leaves modified since last update"""
+        
+        if self.__dirty is None:
+            return
+        
+        lo, hi = self.__dirty
+        self.__dirty = None
+        
+        levels = self.__levels
+        for level in xrange(1, len(levels)):
+            lo, hi = lo // 2, (hi + 1) // 2
+            children = levels[level-1]
+            np.maximum(children[2*lo:2*hi:2], children[2*lo+1:2*hi:2], 
+                       out=levels[level][lo:hi])
+    
+    def __modified(self, lo, hi):
+        """Mark leaves[lo:hi] as modified"""
+        if self.__dirty is not None:
+            lo, hi = min(lo, self.__dirty[0]), max(hi, self.__dirty[1])
+        self.__dirty = lo, hi
+    
+    def copy(self):
+        index = _EndIndex.__new__(_EndIndex)
+        index.__n = self.__n
+        index.__levels = [level.copy() for level in self.__levels]
+        index.__dirty = self.__dirty
+        return index
+    
+    def __len__(self):
+        return self.__n
+    
+    def max(self):
+        """Greatest end time (None if there is no segment)"""
+        self.__update()
+        return float(self.__levels[-1][0]) if self.__n else None
+    
+    def insert(self, index, end):
+        """Insert end time of a new segment at position `index`"""
+        
+        n = self.__n
+        leaves = self.__levels[0]
+        
+        # no spare leaf: rebuild twice as large a tree
+        if n == len(leaves):
+            self.__build(np.insert(leaves, index, end))
+            return
+        
+        leaves[index+1:n+1] = leaves[index:n]
+        leaves[index] = end
+        self.__n = n + 1
+        self.__modified(index, n + 1)
+    
+    def delete(self, index):
+        """Delete end time of segment at position `index`"""
+        
+        n = self.__n
+        leaves = self.__levels[0]
+        
+        leaves[index:n-1] = leaves[index+1:n]
+        leaves[n-1] = -np.inf
+        self.__n = n - 1
+        self.__modified(index, n)
+    
+    def search(self, t, index):
+        """Positions of segments ending at or after `t`
+        
+        Only the first `index` segments are considered. Runs in 
+        O((k+1) log n) where k is the number of returned positions
+        (subtrees of 32 segments or less are scanned at once).
+        
+        Returns
+        -------
+        positions : list
+            Sorted positions i < index such that i.th segment ends at or 
+            after `t`.
+        
+        """
+        
+        self.__update()
+        levels = self.__levels
+        leaves = levels[0]
+        positions = []
+        
+        # depth-first traversal, left child first
+        stack = [(len(levels) - 1, 0)]
+        while stack:
+            level, node = stack.pop()
+            # prune subtrees out of range or with no segment ending after t
+            lo = node << level
+            if lo >= index or levels[level].item(node) < t:
+                continue
+            # small subtrees: scan their leaves at once
+            if level <= 5:
+                hi = min((node + 1) << level, index)
+                found = np.flatnonzero(leaves[lo:hi] >= t) + lo
+                positions.extend(found.tolist())
+            else:
+                stack.append((level - 1, 2 * node + 1))
+                stack.append((level - 1, 2 * node))
+        
+        return positions
+    
+    def first(self, t):
+        """Position of first segment ending after `t` -- O(log n)
+        
+        Returns the number of segments if there is none.
+        
+        """
+        
+        self.__update()
+        levels = self.__levels
+        if not self.__n or levels[-1][0] <= t:
+            return self.__n
+        
+        # go down the tree, to the left whenever possible
+        node = 0
+        for level in xrange(len(levels) - 1, 0, -1):
+            node = 2 * node
+            if levels[level-1].item(node) <= t:
+                node += 1
+        return node
+
   
 class Timeline(object):
     """
@@ -144,19 +361,149 @@ class Timeline(object):
         # i.e. more or less sorted by segment end time).
         self.__rsegments = []
         
+        # this is meant to store the end time of every segment, in the 
+        # same order as .__segments. it is used as an interval index:
+        # see .__candidates()
+        self.__ends = _EndIndex()
+        
+        # this set is meant to store the very same segments as .__segments.
+        # it is used for O(1) membership test and duplicate detection.
+        self.__set = set([])
+        
+        # True when the four structures above may be shared with another 
+        # timeline (see .copy()): they must then be duplicated before any 
+        # in-place modification (see .__unshare()).
+        self.__shared = False
+        
+        # this dictionary is meant to store results of read-only methods
+        # (coverage, duration, extent, etc.) so that they are only computed 
+        # once. it must be cleared every time the timeline is modified.
+        self.__cache = {}
+        
         if segments is not None:
             try:
-                # Add every segment, one after the other
-                for segment in segments:
-                    self += segment
+                # Add all segments at once (sort once, deduplicate once)
+                self.__build(segments)
             except Exception, e:
                 raise ValueError('Timeline must be initialized using a'
                                  'Segment iterator.')
     
+    @classmethod
+    def from_segments(cls, segments, video=None, assume_sorted=False):
+        """Bulk timeline construction
+        
+        Sort segments once, remove empty and duplicate ones in one pass, and
+        build both internal orderings at once -- which is O(n log n) instead
+        of O(n²) when adding segments one after the other.
+        
+        Parameters
+        ----------
+        segments : Segment iterator
+        video : string, optional
+            name of (audio or video) segmented document
+        assume_sorted : bool, optional
+            Set to True when `segments` are known to be sorted, non-empty and
+            unique (eg. when iterating over another timeline) to skip sorting
+            and deduplication. Defaults to False.
+        
+        Returns
+        -------
+        timeline : Timeline
+        
+        Examples
+        --------
+        
+            >>> segments = [Segment(6, 8), Segment(0, 1), Segment(6, 8)]
+            >>> timeline = Timeline.from_segments(segments, video="MyVideo.avi")
+            >>> print timeline
+            [
+               [0 --> 1]
+               [6 --> 8]
+            ]
+        
+        """
+        timeline = cls(video=video)
+        timeline.__build(segments, assume_sorted=assume_sorted)
+        return timeline
+    
+    def __getstate__(self):
+        """Compact state: two arrays of start and end times
+        
+        Pickling a timeline therefore does not pickle every Segment (and
+        RevSegment) separately.
+        
+        """
+        starts, ends = self.__get_arrays()
+        return {'video': self.video, 'starts': starts, 'ends': ends}
+    
+    def __setstate__(self, state):
+        Timeline.__init__(self, video=state['video'])
+        segments = [Segment(start=start, end=end) for start, end
+                    in zip(state['starts'].tolist(), state['ends'].tolist())]
+        # segments were saved sorted, non-empty and unique
+        self.__build(segments, assume_sorted=True)
+    
+    def save(self, path):
+        """Save timeline to disk, in compact .npz format
+        
+        Parameters
+        ----------
+        path : str
+            Path to .npz file ('.npz' extension is appended if missing).
+        
+        See Also
+        --------
+        Timeline.load
+        
+        """
+        state = self.__getstate__()
+        video = state.pop('video')
+        if video is not None:
+            state['video'] = np.array(video)
+        npz.save(path, **state)
+    
+    @classmethod
+    def load(cls, path):
+        """Load timeline saved with .save()
+        
+        Segments are rebuilt from arrays at once: use ColumnarTimeline.load()
+        to memory-map them instead.
+        
+        Parameters
+        ----------
+        path : str
+            Path to .npz file ('.npz' extension is appended if missing).
+        
+        Returns
+        -------
+        timeline : Timeline
+        
+        Examples
+        --------
+            
+            >>> import tempfile, os
+            >>> path = os.path.join(tempfile.mkdtemp(), 'timeline')
+            >>> timeline = Timeline([Segment(0, 1), Segment(6, 8)],
+            ...                     video="MyVideo.avi")
+            >>> timeline.save(path)
+            >>> loaded = Timeline.load(path)
+            >>> print loaded.video, loaded == timeline
+            MyVideo.avi True
+        
+        """
+        state = npz.load(path, mmap=False)
+        video = state.pop('video', None)
+        state['video'] = None if video is None else video.item()
+        timeline = cls.__new__(cls)
+        timeline.__setstate__(state)
+        return timeline
+    
     def __get_video(self): 
         return self.__video
     def __set_video(self, value):
         self.__video = value
+        # cached coverage has the old video
+        self.__cache.clear()
     video = property(fget=__get_video, fset=__set_video)
     """Path to (or any identifier of) segmented video
     
@@ -170,56 +517,96 @@ class Timeline(object):
     
     """
     
-    # Recursive binary search helper function
-    def __search_helper(self, element, sorted_list, left, right):
+    def __build(self, segments, assume_sorted=False):
+        """(Re)build internal sorted lists from a bunch of segments"""
         
-        # Stop recursive search when position is found.
-        if (left+1) >= right:
-            return right
-            
-        # Binary search pivot
-        mid = (left+right)/2
+        segments = list(segments)
         
-        if element < sorted_list[mid]:
-            # Search in left part
-            return self.__search_helper(element, sorted_list, left, mid)
-        else:
-            # Search in right part
-            return self.__search_helper(element, sorted_list, mid, right)
+        for segment in segments:
+            if not isinstance(segment, Segment):
+                raise TypeError("unsupported type: '%s'. "
+                                "Must be Segment." % type(segment).__name__)
+        
+        if not assume_sorted:
+            # sort once (start time first, then end time)...
+            segments.sort(key=lambda s: (s.start, s.end))
+            # ... then remove empty and duplicate segments in one pass
+            unique = []
+            for segment in segments:
+                if segment and (not unique or segment != unique[-1]):
+                    unique.append(segment)
+            segments = unique
+        
+        self.__segments = segments
+        self.__set = set(segments)
+        self.__shared = False
+        self.__cache.clear()
+        
+        # RevSegment ordering: end time first, then reversed start time
+        self.__rsegments = sorted([RevSegment(segment) for segment in segments],
+                                  key=lambda s: (s.end, -s.start))
+        
+        self.__ends = _EndIndex([segment.end for segment in segments])
     
-    def __search(self, element, sorted_list):
-        """Search insertion position in sorted list.
+    def __unshare(self):
+        """Duplicate internal structures if they are shared (copy-on-write)"""
+        if self.__shared:
+            self.__segments = list(self.__segments)
+            self.__rsegments = list(self.__rsegments)
+            self.__ends = self.__ends.copy()
+            self.__set = set(self.__set)
+            self.__shared = False
+    
+    def __compact(self, removed):
+        """Remove a set of segments in one O(n) pass
+        
+        Both sorted lists are filtered (which preserves their ordering) and
+        the interval index is rebuilt, instead of removing segments one at a
+        time -- which would cost O(n) each.
         
         Parameters
-        ----------        
-        element : any object with comparison operators
-            Element meant to be inserted into `sorted_list`
-        sorted_list : list of objects of same type as `element`
-            Sorted list into which `element` is to be inserted.
+        ----------
+        removed : set
+            Segments to remove (they must all exist in timeline).
         
-        Returns
-        -------        
-        index : int
-            Index of position where to insert `element` into `sorted_list`
-            so that the resulting list is still sorted.
-                
         """
-        # If list is empty, add unique element to the list
-        if len(sorted_list) == 0:
-            return 0
-        
-        # If element is smaller than the smallest element of the list,
-        # add it at the beginning of the list
-        if element < sorted_list[0]:
-            return 0
-            
-        # If element is greater than the greatest element of the list,
-        # add it at the end of the list
-        if element > sorted_list[-1]:
-            return len(sorted_list)
+        
+        if not removed:
+            return
+        
+        self.__segments = [s for s in self.__segments if s not in removed]
+        # RevSegment and Segment share the same hash and equality
+        self.__rsegments = [s for s in self.__rsegments if s not in removed]
+        self.__set = self.__set - removed
+        self.__shared = False
+        self.__cache.clear()
+        self.__ends = _EndIndex([segment.end for segment in self.__segments])
     
-        # Otherwise, binary search for the correct position
-        return self.__search_helper(element, sorted_list, 0, len(self))    
+    def extend(self, segments):
+        """Add a bunch of segments at once
+        
+        Equivalent to (but much faster than) adding segments one after the
+        other with `timeline += segment`.
+        
+        Parameters
+        ----------
+        segments : Segment iterator
+        
+        Examples
+        --------
+        
+            >>> timeline = Timeline([Segment(0, 1), Segment(6, 8)])
+            >>> timeline.extend([Segment(2, 3), Segment(0, 1), Segment(4, 4)])
+            >>> print timeline
+            [
+               [0 --> 1]
+               [2 --> 3]
+               [6 --> 8]
+            ]
+        
+        """
+        # Timsort merges the two sorted runs in linear time
+        self.__build(self.__segments + list(segments))
     
     def __iadd__(self, other):
         """Use expression 'timeline += other'
@@ -242,19 +629,27 @@ class Timeline(object):
         if isinstance(other, Segment):
             
             # do nothing if segment is empty of already exists
-            if (not other) or (other in self.__segments):
+            if (not other) or (other in self.__set):
                 return self
             
+            self.__unshare()
+            
             # position in Segment list
-            index = self.__search(other, self.__segments)
+            index = bisect_right(self.__segments, other)
                 
             # position in RevSegment list
             rehto = RevSegment(other)
-            xedni = self.__search(rehto, self.__rsegments)
+            xedni = bisect_right(self.__rsegments, rehto)
                 
-            # add segment in both lists
+            # add segment in both lists (and membership index)
             self.__segments.insert(index, other)
             self.__rsegments.insert(xedni, rehto)
+            self.__set.add(other)
+            
+            # keep interval index up to date
+            self.__ends.insert(index, other.end)
+            
+            self.__cache.clear()
             
             return self
             
@@ -265,13 +660,12 @@ class Timeline(object):
                 raise ValueError("video conflict:"
                                  "'%s' and '%s" % (self.video, other.video))
         
-        # call timeline += segment for each segment in iterator/timeline
+        # add all segments from iterator/timeline at once
         # will raise a TypeError in case one segment cannot be added
         try:
-            for segment in other:
-                self += segment
+            self.extend(other)
             return self
-        except Exception, e:
+        except TypeError, e:
             raise TypeError("unsupported operand type(s) for +=:"
                             "must be Segment or Segment iterator.")
     
@@ -401,16 +795,20 @@ class Timeline(object):
             raise TypeError("unsupported type: '%s'. " 
                             "Must be Segment." % type(segment).__name__)
         
-        index = self.__search(segment, self.__segments)-1
-        if self[index] == segment:
-            return index
-        else:
+        # fail fast thanks to membership index
+        if segment not in self.__set:
             raise ValueError("timeline does not contain segment %s." % segment)
+        
+        return bisect_left(self.__segments, segment)
     
     # ------------------------------------------------------------------- #
     
-    def __intersecting(self, segment):
-        """Sorted list of intersecting segments"""
+    def __candidates(self, segment):
+        """Sorted positions of segments intersecting `segment`
+        
+        Runs in O((k+1) log n) where k is the number of returned positions.
+        
+        """
         
         # if segment is empty, it intersects nothing.
         if not segment:
@@ -421,22 +819,274 @@ class Timeline(object):
         
         dummy_end = Segment(segment.end-SEGMENT_PRECISION, \
                             segment.end-SEGMENT_PRECISION)
-        index = self.__search(dummy_end, self.__segments)
-        # property 1:
-        # every segment in __segments[:index] starts before key ends
+        index = bisect_left(self.__segments, dummy_end)
+        # every segment in __segments[:index] starts before key ends...
+        
+        # ... but only some of them end after key starts
+        start = segment.start+SEGMENT_PRECISION
+        return self.__ends.search(start, index)
+    
+    def view(self, segment, mode='intersection'):
+        """Lazy sub-timeline
+        
+        Same as 'timeline(segment, mode=mode)' except that no Timeline is 
+        built: the returned view only references the (sorted) segments 
+        intersecting `segment`, and segments are only filtered (in 'strict'
+        mode) or trimmed (in 'intersection' mode) while iterating.
+        
+        Runs in O((k+1) log n) where k is the number of segments 
+        intersecting `segment`, whatever the duration of the other ones.
+        
+        Views are meant to be used right away (eg. iterated once): they 
+        must not be used once the timeline has been modified.
+        
+        Parameters
+        ----------
+        segment : Segment
+        mode : {'strict', 'loose', 'intersection'}
+            Default `mode` is 'intersection'.
+        
+        Returns
+        -------
+        view : TimelineView
+        
+        Examples
+        --------
+        
+            >>> timeline = Timeline([Segment(0, 1), Segment(1, 8), 
+            ...                      Segment(2, 3), Segment(6, 7)])
+            >>> for segment in timeline.view(Segment(2.5, 6.5), mode='loose'):
+            ...     print segment
+            [1 --> 8]
+            [2 --> 3]
+            [6 --> 7]
+            >>> print timeline.view(Segment(2.5, 6.5)).to_timeline()
+            [
+               [2.5 --> 3]
+               [2.5 --> 6.5]
+               [6 --> 6.5]
+            ]
+        
+        See Also
+        --------
+        Timeline.__call__
+        
+        """
+        
+        if not isinstance(segment, Segment):
+            raise TypeError("unsupported argument type: '%s'. Must be "
+                            "Segment." % type(segment).__name__)
+        
+        if mode not in ('strict', 'loose', 'intersection'):
+            raise ValueError('Unsupported mode (%s).' % mode)
+        
+        return TimelineView(self.__segments, self.__candidates(segment), 
+                            segment, mode=mode, video=self.video)
+    
+    # Cached arrays of start times and end times (in the same order as 
+    # segments)
+    def __get_arrays(self):
+        if 'arrays' not in self.__cache:
+            starts = np.array([segment.start for segment in self.__segments], 
+                              dtype=np.float64)
+            ends = np.array([segment.end for segment in self.__segments], 
+                            dtype=np.float64)
+            self.__cache['arrays'] = starts, ends
+        return self.__cache['arrays']
+    
+    def at(self, times):
+        """Segments containing each timestamp
+        
+        Vectorized point queries: segment `timeline[k]` contains timestamp
+        `t` when `timeline[k].start <= t < timeline[k].end`.
+        
+        Parameters
+        ----------
+        times : array-like
+            Timestamps, in seconds.
+        
+        Returns
+        -------
+        t_indices, s_indices : numpy arrays
+            Every pair (t_indices[p], s_indices[p]) is such that segment 
+            timeline[s_indices[p]] contains timestamp times[t_indices[p]].
+            Pairs are sorted by timestamp index, then segment index.
+        
+        Examples
+        --------
+        
+            >>> timeline = Timeline([Segment(0, 4), Segment(1, 2), 
+            ...                      Segment(6, 8)])
+            >>> t_indices, s_indices = timeline.at([1.5, 5, 7])
+            >>> for t, s in zip(t_indices, s_indices):
+            ...     print t, timeline[s]
+            0 [0 --> 4]
+            0 [1 --> 2]
+            2 [6 --> 8]
+        
+        """
+        
+        times = np.asarray(times, dtype=np.float64).ravel()
+        starts, ends = self.__get_arrays()
+        
+        # each segment contains a contiguous range of sorted timestamps:
+        # sorted_times[lo[s]:hi[s]] are in [starts[s], ends[s][
+        order = np.argsort(times, kind='mergesort')
+        sorted_times = times[order]
+        lo = np.searchsorted(sorted_times, starts, side='left')
+        hi = np.searchsorted(sorted_times, ends, side='left')
+        
+        # one (timestamp, segment) pair per timestamp in each range
+        n_pairs = hi - lo
+        s_indices = np.repeat(np.arange(len(starts)), n_pairs)
+        offsets = np.cumsum(n_pairs) - n_pairs
+        t_indices = order[np.arange(np.sum(n_pairs)) - \
+                          np.repeat(offsets - lo, n_pairs)]
+        
+        # sort pairs by timestamp index, then segment index
+        order = np.lexsort((s_indices, t_indices))
+        return t_indices[order], s_indices[order]
+    
+    def before(self, t):
+        """Segment ending last before timestamp `t` -- O(log n)
+        
+        Parameters
+        ----------
+        t : float
+            Timestamp, in seconds.
+        
+        Returns
+        -------
+        segment : Segment or None
+            Segment with the latest end time among those ending before (or
+            at) `t`, None if there is none.
+        
+        Examples
+        --------
+            
+            >>> timeline = Timeline([Segment(0, 4), Segment(1, 2),
+            ...                      Segment(6, 8)])
+            >>> print timeline.before(3)
+            [1 --> 2]
+            >>> print timeline.before(1)
+            None
+        
+        """
+        # reverse sorted list is sorted by end time:
+        # rsegments[:xedni] are the ones ending before (or at) t
+        probe = RevSegment(Segment(start=float('-inf'), end=t))
+        xedni = bisect_right(self.__rsegments, probe)
+        if xedni > 0:
+            return Segment(start=self.__rsegments[xedni-1].start,
+                           end=self.__rsegments[xedni-1].end)
+        return None
+    
+    def after(self, t):
+        """Segment starting first after timestamp `t` -- O(log n)
+        
+        Parameters
+        ----------
+        t : float
+            Timestamp, in seconds.
+        
+        Returns
+        -------
+        segment : Segment or None
+            First segment among those starting after (or at) `t`, None if
+            there is none.
+        
+        Examples
+        --------
+            
+            >>> timeline = Timeline([Segment(0, 4), Segment(1, 2),
+            ...                      Segment(6, 8)])
+            >>> print timeline.after(0.5)
+            [1 --> 2]
+            >>> print timeline.after(7)
+            None
+        
+        """
+        # segments[index:] are the ones starting after (or at) t
+        index = bisect_left(self.__segments, Segment(start=t, end=t))
+        if index < len(self):
+            return self.__segments[index]
+        return None
+    
+    def nearest(self, t):
+        """Segment closest to timestamp `t` -- O(log n)
+        
+        Parameters
+        ----------
+        t : float
+            Timestamp, in seconds.
+        
+        Returns
+        -------
+        segment : Segment or None
+            One segment containing `t` (i.e. such that start <= t < end) if
+            it exists, otherwise the closest of `before(t)` and `after(t)`.
+            None if timeline is empty.
+        
+        Examples
+        --------
+            
+            >>> timeline = Timeline([Segment(0, 4), Segment(1, 2),
+            ...                      Segment(6, 8)])
+            >>> print timeline.nearest(4.5)
+            [0 --> 4]
+            >>> print timeline.nearest(5.5)
+            [6 --> 8]
+        
+        """
+        
+        # segments[:index] start before (or at) t
+        index = bisect_right(self.__segments,
+                             Segment(start=t, end=float('inf')))
+        # segments[xedni] is the first one ending after t
+        xedni = self.__ends.first(t)
+        if xedni < index:
+            return self.__segments[xedni]
+        
+        before = self.before(t)
+        after = self.after(t)
+        if before is None:
+            return after
+        if after is None:
+            return before
+        if t - before.end <= after.start - t:
+            return before
+        return after
+    
+    def neighbors(self, segment):
+        """Closest non-overlapping segments on either side of `segment`
+        
+        Parameters
+        ----------
+        segment : Segment
+            Any segment (it does not need to be part of the timeline).
         
-        dummy_start = RevSegment(Segment(segment.start+SEGMENT_PRECISION, \
-                                         segment.start+SEGMENT_PRECISION))
-        xedni = self.__search(dummy_start, self.__rsegments)
-        # property 2:
-        # every segment in __rsegments[xedni:] ends after key starts
+        Returns
+        -------
+        previous, next : Segment or None
+            `before(segment.start)` and `after(segment.end)`.
+            Use `segment ^ next` to get the gap between them.
         
-        # get segments with both properties
-        both = set(self.__segments[:index]) & set(self.__rsegments[xedni:])
+        Examples
+        --------
+            
+            >>> timeline = Timeline([Segment(0, 1), Segment(1, 3),
+            ...                      Segment(2, 4), Segment(6, 8)])
+            >>> previous, next = timeline.neighbors(Segment(1, 3))
+            >>> print previous, next
+            [0 --> 1] [6 --> 8]
+            >>> print Segment(1, 3) ^ next
+            [3 --> 6]
         
-        # make sure every RevSegment is converted to Segment
-        # and return their sorted list
-        return sorted([rsegment.copy() for rsegment in both])
+        """
+        if not isinstance(segment, Segment):
+            raise TypeError("unsupported type: '%s'. "
+                            "Must be Segment." % type(segment).__name__)
+        return self.before(segment.start), self.after(segment.end)
     
     def __call__(self, subset, mode='intersection'):
         """Sub-timeline
@@ -495,24 +1145,13 @@ class Timeline(object):
                             "Segment or Timeline." % type(subset).__name__)
         
         if isinstance(subset, Segment):
-            segment = subset     
-            isegments = self.__intersecting(segment)
-            if mode == 'strict':
-                isegments = [isegment for isegment in isegments \
-                                      if isegment in segment]
-            elif mode == 'intersection':
-                isegments = [isegment & segment for isegment in isegments]
-            elif mode == 'loose':
-                pass
-            else:
-                raise ValueError('Unsupported mode (%s).' % mode)
-            timeline = Timeline(segments=isegments, video=self.video)
-        
+            timeline = self.view(subset, mode=mode).to_timeline()
         
         elif isinstance(subset, Timeline):
-            timeline = Timeline(video=self.video)
+            isegments = []
             for segment in subset.coverage():
-                timeline += self.__call__(segment, mode=mode)
+                isegments.extend(self.view(segment, mode=mode))
+            timeline = Timeline.from_segments(isegments, video=self.video)
         
         return timeline
     
@@ -587,28 +1226,28 @@ class Timeline(object):
             raise KeyError("unsupported type for key: '%s'. Must be int, "
                            "slice or Segment." % type(key).__name__)
         
+        self.__cache.clear()
+        
         # del timeline[i]
         # remove i.th segment
         if isinstance(key, int):
             # find segment in reverse sorted list
+            if key < 0:
+                key += len(self)
             segment = self.__segments[key]
-            yek = self.__search(RevSegment(segment), self.__rsegments)-1
-            # delete segment in both lists
+            self.__unshare()
+            yek = bisect_left(self.__rsegments, RevSegment(segment))
+            # delete segment in both lists (and membership index)
             del self.__segments[key]
             del self.__rsegments[yek]
+            self.__set.discard(segment)
+            # keep interval index up to date
+            self.__ends.delete(key)
             
         # del timeline[i:j]
         # remove i.th to (j-1).th segments
         elif isinstance(key, slice):
-            segments = self.__segments[key]
-            for segment in segments:
-                # find segment in sorted list
-                index = self.__search(segment, self.__segments)-1
-                # find segment in reverse sorted list
-                xedni = self.__search(RevSegment(segment), self.__rsegments)-1
-                # delete segment in both lists
-                del self.__segments[index]
-                del self.__rsegments[xedni]
+            self.__compact(set(self.__segments[key]))
                 
         # del timeline[segment]
         # remove segment (if it exists)                
@@ -620,8 +1259,85 @@ class Timeline(object):
         
     def clear(self):
         """Faster 'del timeline[:]'"""
-        del self.__segments[:]
-        del self.__rsegments[:]
+        self.__segments = []
+        self.__rsegments = []
+        self.__ends = _EndIndex()
+        self.__set = set([])
+        self.__shared = False
+        self.__cache.clear()
+    
+    def remove_many(self, segments):
+        """Remove a bunch of segments at once
+        
+        Segments that do not exist in timeline are simply ignored.
+        
+        Parameters
+        ----------
+        segments : Segment iterator
+            Segments to remove.
+        
+        Examples
+        --------
+        
+            >>> timeline = Timeline([Segment(0, 1), Segment(1, 8), 
+            ...                      Segment(2, 3), Segment(6, 7)])
+            >>> timeline.remove_many([Segment(1, 8), Segment(6, 7), 
+            ...                       Segment(4, 5)])
+            >>> print timeline
+            [
+               [0 --> 1]
+               [2 --> 3]
+            ]
+        
+        """
+        self.__compact(self.__set.intersection(segments))
+    
+    def filter(self, predicate):
+        """Only keep segments satisfying a predicate (in place)
+        
+        Parameters
+        ----------
+        predicate : function
+            Function taking a segment as input and returning True for 
+            segments that must be kept, False for those that must be removed.
+        
+        Examples
+        --------
+        
+            >>> timeline = Timeline([Segment(0, 1), Segment(1, 8), 
+            ...                      Segment(2, 3), Segment(6, 7)])
+            >>> timeline.filter(lambda segment: segment.start > 1)
+            >>> print timeline
+            [
+               [2 --> 3]
+               [6 --> 7]
+            ]
+        
+        """
+        self.remove_many([s for s in self.__segments if not predicate(s)])
+    
+    def drop_shorter_than(self, duration):
+        """Remove segments shorter than `duration` (in place)
+        
+        Parameters
+        ----------
+        duration : float
+            Minimum duration of kept segments, in seconds.
+        
+        Examples
+        --------
+        
+            >>> timeline = Timeline([Segment(0, 0.1), Segment(1, 8), 
+            ...                      Segment(2, 2.5), Segment(6, 7)])
+            >>> timeline.drop_shorter_than(1)
+            >>> print timeline
+            [
+               [1 --> 8]
+               [6 --> 7]
+            ]
+        
+        """
+        self.filter(lambda segment: segment.duration >= duration)
     
     def __eq__(self, other):
         """Use expression 'timeline1 == timeline2'
@@ -679,11 +1395,7 @@ class Timeline(object):
         # True if `included` segment exists in timeline,
         # False otherwise
         if isinstance(included, Segment):
-            try:
-                i = self.index(included)
-                return True
-            except Exception, e:
-                return False
+            return included in self.__set
         
         # True if every segment of included timeline 
         # exists in timeline, False otherwise
@@ -736,7 +1448,7 @@ class Timeline(object):
 
         # 'loose' mode is equivalent to 'strict' mode applied on coverage
         elif mode == 'loose':
-            coverage = self.coverage()
+            coverage = self.__get_coverage()
             return coverage.covers(covered, mode='strict')
         
     
@@ -756,7 +1468,7 @@ class Timeline(object):
             timeline and the provided segment (or timeline segments).
         
         """
-        return self(other, mode='intersection').coverage()
+        return self.intersection(other)
     
     def __or__(self, other):
         """Union of two timelines (or a timeline and a segment)
@@ -774,7 +1486,283 @@ class Timeline(object):
             timeline and the provided timeline (or segment)
         
         """
-        return (self + other).coverage()
+        return self.union(other)
+    
+    # Segments of the coverage of a segment or timeline, as a sorted list
+    @staticmethod
+    def __coverage_list(other):
+        
+        if isinstance(other, Segment):
+            return [other] if other else []
+        
+        if isinstance(other, Timeline):
+            return list(other.__get_coverage())
+        
+        raise TypeError("unsupported operand type: '%s'. Must be "
+                        "Segment or Timeline." % type(other).__name__)
+    
+    def __check_video(self, other):
+        """Raise ValueError if `other` timeline is about another video"""
+        if isinstance(other, Timeline) and self.video != other.video:
+            raise ValueError("video conflict: "
+                             "'%s' and '%s'" % (self.video, other.video))
+    
+    def union(self, other):
+        """Union of two timelines (or a timeline and a segment)
+        
+        Computed with one merge pass over both coverages -- O(n + m).
+        
+        Parameters
+        ----------
+        other : Segment or Timeline
+        
+        Returns
+        -------
+        union : Timeline
+            Coverage of the union of both timelines.
+        
+        Examples
+        --------
+        
+            >>> timeline = Timeline([Segment(0, 2), Segment(4, 6)])
+            >>> other = Timeline([Segment(1, 3), Segment(7, 8)])
+            >>> print timeline.union(other)
+            [
+               [0 --> 3]
+               [4 --> 6]
+               [7 --> 8]
+            ]
+        
+        """
+        
+        self.__check_video(other)
+        
+        A = self.__coverage_list(self)
+        B = self.__coverage_list(other)
+        return Timeline.from_segments(stream.union(A, B), video=self.video, 
+                                      assume_sorted=True)
+    
+    def intersection(self, other):
+        """Intersection of two timelines (or a timeline and a segment)
+        
+        Computed with one merge pass over both coverages -- O(n + m).
+        
+        Parameters
+        ----------
+        other : Segment or Timeline
+        
+        Returns
+        -------
+        intersection : Timeline
+            Coverage of the intersection of both timelines.
+        
+        Examples
+        --------
+        
+            >>> timeline = Timeline([Segment(0, 2), Segment(4, 6)])
+            >>> other = Timeline([Segment(1, 5), Segment(5.5, 8)])
+            >>> print timeline.intersection(other)
+            [
+               [1 --> 2]
+               [4 --> 5]
+               [5.5 --> 6]
+            ]
+        
+        Both timelines must be about the same video:
+        
+            >>> Timeline(video='a') & Timeline(video='b')
+            Traceback (most recent call last):
+            ...
+            ValueError: video conflict: 'a' and 'b'
+        
+        """
+        
+        self.__check_video(other)
+        
+        A = self.__coverage_list(self)
+        B = self.__coverage_list(other)
+        return Timeline.from_segments(stream.intersection(A, B), 
+                                      video=self.video, assume_sorted=True)
+    
+    def difference(self, other):
+        """Difference of two timelines (or a timeline and a segment)
+        
+        Computed with one merge pass over both coverages -- O(n + m).
+        
+        Parameters
+        ----------
+        other : Segment or Timeline
+        
+        Returns
+        -------
+        difference : Timeline
+            Coverage of the part of the timeline not covered by `other`.
+        
+        Examples
+        --------
+        
+            >>> timeline = Timeline([Segment(0, 2), Segment(4, 6)])
+            >>> other = Timeline([Segment(1, 5)])
+            >>> print timeline.difference(other)
+            [
+               [0 --> 1]
+               [5 --> 6]
+            ]
+        
+        """
+        
+        self.__check_video(other)
+        
+        A = self.__coverage_list(self)
+        B = self.__coverage_list(other)
+        return Timeline.from_segments(stream.difference(A, B), 
+                                      video=self.video, assume_sorted=True)
+    
+    def symmetric_difference(self, other):
+        """Symmetric difference of two timelines (or a timeline and a segment)
+        
+        Computed with merge passes over both coverages -- O(n + m).
+        
+        Parameters
+        ----------
+        other : Segment or Timeline
+        
+        Returns
+        -------
+        symmetric_difference : Timeline
+            Coverage of the parts covered by exactly one of the timelines.
+        
+        Examples
+        --------
+        
+            >>> timeline = Timeline([Segment(0, 2), Segment(4, 6)])
+            >>> other = Timeline([Segment(1, 5)])
+            >>> print timeline.symmetric_difference(other)
+            [
+               [0 --> 1]
+               [2 --> 4]
+               [5 --> 6]
+            ]
+        
+        """
+        
+        self.__check_video(other)
+        
+        A = self.__coverage_list(self)
+        B = self.__coverage_list(other)
+        
+        # both differences do not overlap: their union is their merge
+        segments = stream.union(stream.difference(A, B), 
+                                stream.difference(B, A))
+        return Timeline.from_segments(segments, video=self.video, 
+                                      assume_sorted=True)
+    
+    @classmethod
+    def at_least(cls, timelines, k):
+        """Regions covered by at least `k` timelines
+        
+        Computed with one heap-based k-way merge of all (already sorted) 
+        coverages -- O(N log n) for n timelines with N segments in total.
+        
+        Parameters
+        ----------
+        timelines : Timeline (or Segment) iterator
+        k : int
+            Minimum number of timelines covering each region.
+            Use k=1 for union, k=len(timelines) for intersection, and 
+            k=len(timelines)/2+1 for majority voting. 
+            Any k greater than len(timelines) gives an empty timeline.
+        
+        Returns
+        -------
+        coverage : Timeline
+        
+        Raises
+        ------
+        ValueError
+            If `k` is not a positive integer, or timelines are about 
+            different videos.
+        
+        Examples
+        --------
+        
+            >>> timelines = [Timeline([Segment(0, 4), Segment(6, 8)]),
+            ...              Timeline([Segment(1, 7)]),
+            ...              Timeline([Segment(2, 3), Segment(5, 9)])]
+            >>> print Timeline.at_least(timelines, 2)
+            [
+               [1 --> 4]
+               [5 --> 8]
+            ]
+            >>> Timeline.at_least(timelines, 0)
+            Traceback (most recent call last):
+            ...
+            ValueError: k must be a positive integer (got 0).
+        
+        """
+        
+        if not isinstance(k, Integral) or k < 1:
+            raise ValueError("k must be a positive integer (got %r)." % (k, ))
+        
+        timelines = list(timelines)
+        
+        videos = set([t.video for t in timelines if isinstance(t, Timeline)])
+        if len(videos) > 1:
+            raise ValueError("video conflict: %s" % 
+                             ", ".join(["'%s'" % v for v in videos]))
+        video = videos.pop() if videos else None
+        
+        # one sorted stream of boundaries per timeline: 
+        # (time, +1) when entering a coverage segment, (time, -1) when leaving
+        def boundaries(coverage):
+            for segment in coverage:
+                yield segment.start, 1
+                yield segment.end, -1
+        streams = [boundaries(cls.__coverage_list(t)) 
+                   for t in timelines]
+        
+        segments = []
+        active = 0
+        start = None
+        # heapq.merge only keeps one pending boundary per stream in its heap
+        for time, events in groupby(merge(*streams), key=itemgetter(0)):
+            active += sum([delta for _, delta in events])
+            if start is None and active >= k:
+                start = time
+            elif start is not None and active < k:
+                segments.append(Segment(start=start, end=time))
+                start = None
+        
+        # coverage() takes care of empty and contiguous segments
+        return Timeline.from_segments(segments, video=video, 
+                                      assume_sorted=True).coverage()
+    
+    @classmethod
+    def union_all(cls, timelines):
+        """Union of many timelines at once
+        
+        Same as (but much faster than) repeated `union`.
+        
+        See Also
+        --------
+        Timeline.at_least
+        
+        """
+        return cls.at_least(timelines, 1)
+    
+    @classmethod
+    def intersection_all(cls, timelines):
+        """Intersection of many timelines at once
+        
+        Same as (but much faster than) repeated `intersection`.
+        
+        See Also
+        --------
+        Timeline.at_least
+        
+        """
+        timelines = list(timelines)
+        return cls.at_least(timelines, max(1, len(timelines)))
     
     def empty(self):
         """Empty copy of a timeline.
@@ -799,6 +1787,10 @@ class Timeline(object):
         
         If segment_func is provided, apply it to each segment first.
         
+        Copies are copy-on-write: both timelines share the same internal 
+        storage until one of them is modified. Therefore, copying is O(1) 
+        unless segment_func is provided.
+        
         Parameters
         ----------
         segment_func : function
@@ -806,7 +1798,10 @@ class Timeline(object):
         Returns
         -------
         timeline : Timeline
-            A (possibly modified) copy of the timeline
+            A (possibly modified) copy of the timeline. It is an instance of
+            the same class (eg. Segmentation) unless segment_func is provided,
+            in which case it is a plain Timeline, as transformed segments may 
+            no longer satisfy the invariant of the original class.
 
         Examples
         --------
@@ -823,17 +1818,20 @@ class Timeline(object):
             ]
         
         """
-        timeline = self.empty()
-        
-        # If segment_func is not provided
-        # make it a pass-through function
+        # If segment_func is not provided, share internal structures
         if segment_func is None:
-            segment_func = lambda segment: segment
-
-        for segment in self:
-            timeline += segment_func(segment)
-        
-        return timeline
+            timeline = self.__class__(video=self.video)
+            timeline.__segments = self.__segments
+            timeline.__rsegments = self.__rsegments
+            timeline.__ends = self.__ends
+            timeline.__set = self.__set
+            # cached values are never modified: they can be shared as well
+            timeline.__cache = dict(self.__cache)
+            timeline.__shared = self.__shared = True
+            return timeline
+        
+        return Timeline.from_segments([segment_func(segment) 
+                                       for segment in self], video=self.video)
     
     def extent(self):
         """Timeline extent
@@ -856,11 +1854,16 @@ class Timeline(object):
             [0 --> 10]
         
         """
+        if 'extent' not in self.__cache:
+            self.__cache['extent'] = self.__extent()
+        return self.__cache['extent']
+    
+    def __extent(self):
         if self:
             # The extent of a timeline ranges from the start time
             # of the earliest segment to the end time of the latest one.
             start_time = self.__segments[0].start
-            end_time = self.__rsegments[-1].end
+            end_time = self.__ends.max()
             return Segment(start=start_time, end=end_time)
         else:
             # The extent of an empty timeline is an empty segment 
@@ -880,45 +1883,26 @@ class Timeline(object):
             Timeline coverage
         
         """
-
+        # return a copy so that cached coverage cannot be modified
+        return self.__get_coverage().copy()
+    
+    # Cached coverage (must not be modified!)
+    def __get_coverage(self):
+        if 'coverage' not in self.__cache:
+            self.__cache['coverage'] = self.__coverage()
+        return self.__cache['coverage']
+    
+    def __coverage(self):
+        
         # The coverage of an empty timeline is an empty timeline.
         if not self:
-            return self.copy()
+            return self.empty()
         
+        # Since segments are kept sorted internally, there is no need to 
+        # perform an exhaustive segment clustering: one pass is enough.
         # Make sure video attribute is kept.
-        coverage = Timeline(video=self.video)
-        
-        # Principle: 
-        #   * gather all segments with no gap between them
-        #   * add one segment per resulting group (their union |)
-        # Note:
-        #   Since segments are kept sorted internally, 
-        #   there is no need to perform an exhaustive segment clustering.
-        #   We just have to consider them in their natural order.
-        
-        # Initialize new coverage segment
-        # as very first segment of the timeline
-        new_segment = self[0]
-        
-        for segment in self[1:]:
-            
-            # If there is no gap between new coverage segment and next segment,
-            if not (segment ^ new_segment):
-                # Extend new coverage segment using next segment
-                new_segment |= segment
-            
-            # If there actually is a gap,
-            else:
-                # Add new segment to the timeline coverage
-                coverage += new_segment
-                # Initialize new coerage segment as next segment
-                # (right after the gap)
-                new_segment = segment
-        
-        # Add new segment to the timeline coverage
-        coverage += new_segment
-        
-        return coverage
+        return Timeline.from_segments(stream.coverage(self.__segments), 
+                                      video=self.video, assume_sorted=True)
     
     def duration(self):
         """Timeline duration
@@ -932,7 +1916,10 @@ class Timeline(object):
         
         # The timeline duration is the sum of the durations
         # of the segments in the timeline coverage. 
-        return sum([segment.duration for segment in self.coverage()])
+        if 'duration' not in self.__cache:
+            self.__cache['duration'] = sum([segment.duration \
+                                            for segment in self.__get_coverage()])
+        return self.__cache['duration']
     
     def gaps(self, focus=None):
         """Timeline gaps
@@ -962,41 +1949,11 @@ class Timeline(object):
             raise TypeError("unsupported operand type(s) for -':"
                             "%s and Timeline." % type(focus).__name__)
         
-        # segment focus
-        if isinstance(focus, Segment):
-            
-            # starts with an empty timeline
-            timeline = self.empty()
-            
-            # `end` is meant to store the end time of former segment
-            # initialize it with beginning of provided segment `focus`
-            end = focus.start
-            
-            # focus on the intersection of timeline and provided segment
-            for segment in self(focus, mode='intersection').coverage():
-                
-                # add gap between each pair of consecutive segments
-                # if there is no gap, segment is empty, therefore not added
-                # see .__iadd__ for more information.
-                timeline += Segment(start=end, end=segment.start)
-                
-                # keep track of the end of former segment
-                end = segment.end
-            
-            # add final gap (if not empty)
-            timeline += Segment(start=end, end=focus.end)
-
-        # other_timeline - timeline
-        elif isinstance(focus, Timeline):
-            
-            # starts with an empty timeline
-            timeline = self.empty()
-            
-            # add gaps for every segment in coverage of provided timeline
-            for segment in focus.coverage():
-                timeline += self.gaps(focus=segment)
-        
-        return timeline
+        # gaps are the part of focus not covered by the timeline
+        segments = stream.gaps(self.__coverage_list(self), 
+                               focus=self.__coverage_list(focus))
+        return Timeline.from_segments(segments, video=self.video, 
+                                      assume_sorted=True)
     
     def is_segmentation(self):
         """Check whether timeline contains overlapping segments
@@ -1013,6 +1970,11 @@ class Timeline(object):
             Timeline has overlapping segments.
         
         """
+        if 'is_segmentation' not in self.__cache:
+            self.__cache['is_segmentation'] = self.__is_segmentation()
+        return self.__cache['is_segmentation']
+    
+    def __is_segmentation(self):
         
         # Empty timelines have no overlapping segments
         if not self:
@@ -1066,41 +2028,61 @@ class Timeline(object):
         if self.is_segmentation():
             return self.copy()
 
-        # get all boundaries (sorted)
+        # sweep through sorted boundaries, keeping track of the number of
+        # segments active right after each of them 
         # |------|    |------|     |----|
         #   |--|    |-----|     |----------|
         # becomes
-        # | |  | |  | |   |  |  |  |    |  |
-        boundaries = []
-        for s, segment in enumerate(self):
-            start = segment.start
-            end   = segment.end
-            if start not in boundaries:
-                boundaries.append(start)
-            if end   not in boundaries:
-                boundaries.append(end) 
-        boundaries = sorted(boundaries)
-
-        # create new partition timeline
-        # | |  | |  | |   |  |  |  |    |  |
-        # becomes
+        # 1 2  1 0  1 2   1  0  1  2    1  0
+        # and every elementary piece with at least one active segment is kept
         # |-|--|-|  |-|---|--|  |--|----|--|
-
-        # start with an empty copy
-        timeline = self.empty()
         
-        start = boundaries[0]
-        for boundary in boundaries[1:]:
-            
-            new_segment = Segment(start=start, end=boundary)
-            
-            # only add segments that are covered by original timeline
-            if self.covers(new_segment, mode='strict'):
-                timeline += Segment(start=start, end=boundary)
+        events = [(segment.start, 1) for segment in self] + \
+                 [(segment.end, -1) for segment in self]
+        events.sort()
+        
+        segments = []
+        active = 0
+        previous = None
+        for boundary, delta in events:
+            if active > 0 and boundary != previous:
+                segment = Segment(start=previous, end=boundary)
+                if segment:
+                    segments.append(segment)
+            active += delta
+            previous = boundary
+        
+        return Timeline.from_segments(segments, video=self.video, 
+                                      assume_sorted=True)
+    
+    def depth(self):
+        """Overlap depth profile
         
-            start = boundary
+        Number of simultaneously active segments, computed with one sweep
+        over sorted boundaries -- O(n log n).
         
-        return timeline
+        Returns
+        -------
+        boundaries : numpy array
+            Sorted unique segment boundaries.
+        counts : numpy array
+            counts[i] is the number of segments active between 
+            boundaries[i] and boundaries[i+1] (possibly zero, in gaps).
+        
+        Examples
+        --------
+        
+            >>> timeline = Timeline([Segment(0, 4), Segment(1, 2), 
+            ...                      Segment(1, 3), Segment(5, 6)])
+            >>> boundaries, counts = timeline.depth()
+            >>> print boundaries
+            [0. 1. 2. 3. 4. 5. 6.]
+            >>> print counts
+            [1 3 2 1 0 1]
+        
+        """
+        return _depth([segment.start for segment in self],
+                      [segment.end for segment in self])
     
     def is_partition(self):
         """Check for partition
@@ -1130,21 +2112,410 @@ class Timeline(object):
             ...     print "Timeline is a partition."
             
         """
-        return self and \
-               self.is_segmentation() and \
-               Timeline([self.extent()], video=self.video) == self.coverage()
+        if 'is_partition' not in self.__cache:
+            self.__cache['is_partition'] = bool(self) and \
+                                           self.is_segmentation() and \
+                                           len(self.__get_coverage()) == 1
+        return self.__cache['is_partition']
+    
+
+class TimelineView(object):
+    """
+    Lazy sub-timeline, as returned by Timeline.view()
+    
+    It references the (sorted) segments of a timeline intersecting `focus`
+    and only selects (or trims) them while iterating, without building any
+    intermediate Timeline.
+    
+    Parameters
+    ----------
+    segments : list
+        Sorted segments of the parent timeline.
+    positions : list
+        Sorted positions of segments intersecting `focus`.
+    focus : Segment
+        Segment used to select (or trim) candidate segments.
+    mode : {'strict', 'loose', 'intersection'}, optional
+        Default `mode` is 'intersection'.
+    video : string, optional
+        name of (audio or video) segmented document
+    
+    Examples
+    --------
+    
+        >>> timeline = Timeline([Segment(0, 1), Segment(1, 8), 
+        ...                      Segment(2, 3), Segment(6, 7)])
+        >>> view = timeline.view(Segment(1.5, 4), mode='strict')
+        >>> print len(view)
+        1
+        >>> print list(view)
+        [<Segment(2, 3)>]
+        >>> view = timeline.view(Segment(6.2, 6.8))
+        >>> print list(view)
+        [<Segment(6.2, 6.8)>, <Segment(6.2, 6.8)>]
+        >>> print len(view), len(view.to_timeline())
+        1 1
+    
+    """
+    
+    def __init__(self, segments, positions, focus, mode='intersection', 
+                 video=None):
+        super(TimelineView, self).__init__()
+        self.__segments = segments
+        self.__positions = positions
+        self.__focus = focus
+        self.__mode = mode
+        self.__video = video
+    
+    def __get_video(self): 
+        return self.__video
+    video = property(fget=__get_video)
+    """Path to (or any identifier of) segmented video"""
+    
+    def __get_mode(self):
+        return self.__mode
+    mode = property(fget=__get_mode)
+    """Selection mode ('strict', 'loose' or 'intersection')"""
+    
+    def __iter__(self):
+        """Iterate over selected (or trimmed) segments
+        
+        Segments are yielded in the order of the parent timeline. In 
+        'intersection' mode, trimmed segments may therefore be out of order 
+        or duplicated: use .to_timeline() to get a proper timeline.
+        
+        """
+        
+        focus = self.__focus
+        segments = self.__segments
+        
+        for i in self.__positions:
+            segment = segments[i]
+            if self.__mode == 'loose':
+                yield segment
+            elif self.__mode == 'strict':
+                if segment in focus:
+                    yield segment
+            else:
+                yield segment & focus
     
+    def __len__(self):
+        """Number of selected segments -- O(k)
+        
+        In 'intersection' mode, duplicate and empty trimmed segments are 
+        not counted, so that it always is the length of .to_timeline().
+        
+        """
+        if self.__mode == 'loose':
+            return len(self.__positions)
+        if self.__mode == 'intersection':
+            return len(set([segment for segment in self if segment]))
+        return sum(1 for _ in self)
+    
+    def __nonzero__(self):
+        """Stop at first selected (non-empty) segment"""
+        for segment in self:
+            if segment:
+                return True
+        return False
     
+    def __repr__(self):
+        return "<TimelineView(%s, mode='%s')>" % (repr(self.__focus), 
+                                                  self.__mode)
+    
+    def to_timeline(self):
+        """Materialize view as a new Timeline"""
+        # only 'intersection' mode may break ordering or create duplicates
+        assume_sorted = self.__mode != 'intersection'
+        return Timeline.from_segments(self, video=self.video, 
+                                      assume_sorted=assume_sorted)
+
 
-class Segmentation(Timeline):    
+class Segmentation(Timeline):
+    """
+    Timeline with no overlapping segments.
+    
+    Adding a segment overlapping an existing one raises a ValueError.
+    
+    Parameters
+    ----------
+    segments : Segment iterator, optional
+        initial set of (non-overlapping) segments
+    video : string, optional
+        name of (audio or video) segmented document
+    
+    Examples
+    --------
+    
+        >>> segmentation = Segmentation([Segment(0, 1), Segment(3, 5)])
+        >>> segmentation += Segment(1, 2)
+        >>> segmentation += Segment(4, 6)
+        Traceback (most recent call last):
+        ...
+        ValueError: segment [4 --> 6] overlaps existing segment(s).
+        >>> print segmentation.locate(4.2)
+        [3 --> 5]
+        >>> segmentation.split(4)
+        >>> segmentation.merge(1)
+        >>> print segmentation
+        [
+           [0 --> 2]
+           [3 --> 4]
+           [4 --> 5]
+        ]
+    
+    """
+    
+    def __init__(self, segments=None, video=None):
+        super(Segmentation, self).__init__(segments=segments, video=video)
+        self._check()
+    
+    @classmethod
+    def from_segments(cls, segments, video=None, assume_sorted=False):
+        """Bulk segmentation construction
+        
+        See Also
+        --------
+        Timeline.from_segments
+        
+        """
+        timeline = super(Segmentation, cls).from_segments(
+                                                segments, video=video, 
+                                                assume_sorted=assume_sorted)
+        timeline._check()
+        return timeline
+    
+    def _check(self):
+        """Raise ValueError if timeline invariant does not hold"""
+        if not Timeline.is_segmentation(self):
+            raise ValueError('segments must not overlap.')
+    
     def __iadd__(self, other):
-        raise NotImplementedError('')
+        """Use expression 'segmentation += other'
         
+        Raises
+        ------
+        ValueError if added segment(s) overlap existing ones
+        
+        See Also
+        --------
+        Timeline.__iadd__
+        
+        """
+        if isinstance(other, Segment) and other and other not in self:
+            # O(log n) thanks to interval index
+            if self.view(other, mode='loose'):
+                raise ValueError('segment %s overlaps existing '
+                                 'segment(s).' % other)
+        return super(Segmentation, self).__iadd__(other)
+    
+    def extend(self, segments):
+        """Add a bunch of segments at once
+        
+        Raises
+        ------
+        ValueError if added segments overlap existing (or other added) ones
+        
+        See Also
+        --------
+        Timeline.extend
+        
+        """
+        segments = list(segments)
+        # raises ValueError if invariant would not hold
+        self.__class__.from_segments(list(self) + segments)
+        super(Segmentation, self).extend(segments)
+    
+    def empty(self):
+        """Empty copy of a segmentation."""
+        return self.__class__(video=self.video)
+    
+    def is_segmentation(self):
+        """Always True (invariant is enforced on insert)"""
+        return True
+    
+    def __index_at(self, t):
+        """Position of segment containing t (or -1)"""
+        # number of segments starting before (or at) t
+        index = bisect_right(self, Segment(start=t, end=float('inf'))) - 1
+        if index >= 0 and t < self[index].end:
+            return index
+        return -1
+    
+    def locate(self, t):
+        """Segment containing a timestamp -- O(log n)
+        
+        Parameters
+        ----------
+        t : float
+            Timestamp, in seconds.
+        
+        Returns
+        -------
+        segment : Segment or None
+            Segment such that segment.start <= t < segment.end if it exists,
+            None otherwise.
+        
+        """
+        index = self.__index_at(t)
+        return self[index] if index >= 0 else None
+    
+    def split(self, t):
+        """Split segment containing `t` into two segments at `t`
+        
+        Raises
+        ------
+        ValueError if no segment strictly contains `t`.
+        
+        """
+        index = self.__index_at(t)
+        if index < 0:
+            raise ValueError('no segment contains %g.' % t)
+        segment = self[index]
+        left = Segment(start=segment.start, end=t)
+        right = Segment(start=t, end=segment.end)
+        if not left or not right:
+            raise ValueError('%g is (too close to) a segment boundary.' % t)
+        # invariant holds by construction: bypass checks
+        Timeline.__delitem__(self, index)
+        Timeline.__iadd__(self, left)
+        Timeline.__iadd__(self, right)
+    
+    def merge(self, t):
+        """Merge the two adjacent segments sharing boundary `t`
+        
+        Raises
+        ------
+        ValueError if `t` is not the boundary between two adjacent segments.
+        
+        """
+        index = self.__index_at(t)
+        if index < 1 or self[index].start != t or self[index-1].end != t:
+            raise ValueError('%g is not a boundary between two adjacent '
+                             'segments.' % t)
+        merged = Segment(start=self[index-1].start, end=self[index].end)
+        # invariant holds by construction: bypass checks
+        Timeline.__delitem__(self, slice(index-1, index+1))
+        Timeline.__iadd__(self, merged)
+
+
 class Partition(Segmentation):
+    """
+    Segmentation with no gap: segments cover their extent exactly.
+    
+    Segments can only be added at either end of the partition, and only the 
+    first or last segments can be removed. Use `split` and `merge` to change
+    inner boundaries.
+    
+    Parameters
+    ----------
+    segments : Segment iterator, optional
+        initial set of segments (with neither overlap nor gap)
+    video : string, optional
+        name of (audio or video) segmented document
+    
+    Examples
+    --------
+    
+        >>> partition = Partition([Segment(0, 1), Segment(1, 3)])
+        >>> partition += Segment(3, 4)
+        >>> partition += Segment(5, 6)
+        Traceback (most recent call last):
+        ...
+        ValueError: segment [5 --> 6] would create a gap.
+        >>> partition.split(2)
+        >>> print partition
+        [
+           [0 --> 1]
+           [1 --> 2]
+           [2 --> 3]
+           [3 --> 4]
+        ]
+        >>> del partition[1]
+        Traceback (most recent call last):
+        ...
+        ValueError: removing inner segments would create a gap.
+    
+    """
+    
+    def _check(self):
+        """Raise ValueError if timeline invariant does not hold"""
+        super(Partition, self)._check()
+        if self and not Timeline.is_partition(self):
+            raise ValueError('segments must not have any gap.')
+    
     def __iadd__(self, other):
-        raise NotImplementedError('')
+        """Use expression 'partition += other'
+        
+        Raises
+        ------
+        ValueError if added segment(s) would create overlap or gap
+        
+        See Also
+        --------
+        Timeline.__iadd__
+        
+        """
+        if isinstance(other, Segment) and other and self and \
+           other not in self:
+            # Segment.__xor__ is the gap between two segments
+            if other ^ self.extent():
+                raise ValueError('segment %s would create a gap.' % other)
+        return super(Partition, self).__iadd__(other)
+    
     def __delitem__(self, key):
-        raise NotImplementedError('')
+        """Use expression 'del partition[i]' or 'del partition[segment]' 
+        
+        Raises
+        ------
+        ValueError if it would remove inner segments.
+        
+        See Also
+        --------
+        Timeline.__delitem__
+        
+        """
+        if isinstance(key, Segment):
+            key = self.index(key)
+        
+        if isinstance(key, int):
+            indices = [key % len(self)] if self else []
+        elif isinstance(key, slice):
+            indices = range(*key.indices(len(self)))
+        else:
+            indices = []
+        
+        if indices:
+            first, last = min(indices), max(indices)
+            contiguous = len(indices) == last - first + 1
+            if not contiguous or (first > 0 and last < len(self)-1):
+                raise ValueError('removing inner segments would create '
+                                 'a gap.')
+        
+        super(Partition, self).__delitem__(key)
+    
+    def remove_many(self, segments):
+        """Remove a bunch of segments at once
+        
+        Raises
+        ------
+        ValueError if it would remove inner segments.
+        
+        See Also
+        --------
+        Timeline.remove_many
+        
+        """
+        removed = set(segments)
+        # remaining segments must be contiguous
+        kept = [i for i, segment in enumerate(self) if segment not in removed]
+        if kept and kept[-1] - kept[0] + 1 != len(kept):
+            raise ValueError('removing inner segments would create a gap.')
+        super(Partition, self).remove_many(removed)
+    
+    def is_partition(self):
+        """True unless partition is empty (invariant is enforced on insert)"""
+        return bool(self)
     
 if __name__ == "__main__":
     import doctest
@@ -19,6 +19,7 @@
 #     along with PyAnnote.  If not, see <http://www.gnu.org/licenses/>.
 
 from base import BaseErrorRate
+from pyannote.base.annotation import co_iterate
 
 DER_TOTAL = 'total'
 DER_FALSE_ALARM = 'false alarm'
@@ -40,28 +41,18 @@ class DetectionErrorRate(BaseErrorRate):
         
         detail = self.init_details()
         
-        # common (up-sampled) timeline
-        common_timeline = abs(reference.timeline + hypothesis.timeline)
-    
-        # align reference on common timeline
-        R = reference >> common_timeline
-    
-        # translate and align hypothesis on common timeline
-        H = hypothesis >> common_timeline
-    
-        # loop on all segments
-        for segment in common_timeline:
+        # loop on all elementary regions of both annotations, 
+        # along with their sets of reference (r) and hypothesis (h) IDs
+        for segment, r, h in co_iterate(reference, hypothesis):
         
             # segment duration
-            duration = abs(segment)
+            duration = segment.duration
         
-            # set of IDs in reference segment
-            r = R.ids(segment)
+            # number of IDs in reference segment
             Nr = len(r)
             detail[DER_TOTAL] += duration * Nr
         
-            # set of IDs in hypothesis segment
-            h = H.ids(segment)
+            # number of IDs in hypothesis segment
             Nh = len(h)
         
             # number of misses
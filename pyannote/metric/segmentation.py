@@ -23,7 +23,7 @@
 from base import Precision, Recall
 from base import PRECISION_RETRIEVED, PRECISION_RELEVANT_RETRIEVED
 from base import RECALL_RELEVANT, RECALL_RELEVANT_RETRIEVED
-from ..base.segment import SEGMENT_PRECISION
+from ..base.segment import Segment, SEGMENT_PRECISION
 
 class SegmentationPrecision(Precision):
     def __init__(self, tolerance=0.):
@@ -38,9 +38,8 @@ class SegmentationPrecision(Precision):
                      doc="Tolerance, in seconds.")
     
     def __segment_to_collar(self, segment):
-        collar = segment.copy()
-        collar.start = segment.start - .5 * self.tolerance
-        collar.end =   segment.start + .5 * self.tolerance 
+        collar = Segment(start=segment.start - .5 * self.tolerance, 
+                         end=segment.start + .5 * self.tolerance)
         return collar
         
     def get_details(self, reference, hypothesis, **kwargs):
@@ -55,9 +54,9 @@ class SegmentationPrecision(Precision):
         detail = self.init_details()        
         
         detail[PRECISION_RETRIEVED] = len(hypothesis) - 1
-        R = reference.copy(map_func=self.__segment_to_collar)
+        R = reference.copy(segment_func=self.__segment_to_collar)
         del R[0]
-        H = hypothesis.copy(map_func=self.__segment_to_collar)
+        H = hypothesis.copy(segment_func=self.__segment_to_collar)
         del H[0]
         
         for collar in H:
@@ -79,9 +78,8 @@ class SegmentationRecall(Recall):
                      doc="Tolerance, in seconds.")
     
     def __segment_to_collar(self, segment):
-        collar = segment.copy()
-        collar.start = segment.start - .5 * self.tolerance
-        collar.end =   segment.start + .5 * self.tolerance 
+        collar = Segment(start=segment.start - .5 * self.tolerance, 
+                         end=segment.start + .5 * self.tolerance)
         return collar
         
     def get_details(self, reference, hypothesis, **kwargs):
@@ -96,9 +94,9 @@ class SegmentationRecall(Recall):
         detail = self.init_details()        
         
         detail[RECALL_RELEVANT] = len(reference) - 1
-        R = reference.copy(map_func=self.__segment_to_collar)
+        R = reference.copy(segment_func=self.__segment_to_collar)
         del R[0]
-        H = hypothesis.copy(map_func=self.__segment_to_collar)
+        H = hypothesis.copy(segment_func=self.__segment_to_collar)
         del H[0]
         
         for collar in R: